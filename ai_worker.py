@@ -0,0 +1,114 @@
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_CONCURRENT = int(os.getenv('NEXUS_MAX_CONCURRENT', '4'))
+
+
+class AIRequest:
+    """Handle for a submitted request; cancel() stops it whether queued or running"""
+
+    def __init__(self, name):
+        self.name = name
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    def cancel(self):
+        self.cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+
+class AIWorker:
+    """Dedicated asyncio loop thread that owns all AI network I/O.
+
+    Blocking HTTP calls run on a fixed executor behind a semaphore, so the
+    number of threads stays flat no matter how many messages are queued.
+    The worker is shared by every bot window, so each submit() names the
+    dispatch function its completion callback goes through (the submitting
+    window's run_on_ui for GTK).
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT):
+        self.max_concurrent = max_concurrent
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="ai-io")
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.running = 0
+        self.queued = 0
+        self.thread = threading.Thread(target=self._run, name="ai-loop", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.ready.set()
+        self.loop.run_forever()
+
+    def submit(self, fn, *args, on_done=None, dispatch=None, name="request"):
+        """Run fn(*args, cancel_event) on the worker and return its AIRequest.
+
+        on_done(request) is handed to dispatch when given, else called on the loop thread.
+        """
+        request = AIRequest(name)
+        request.future = asyncio.run_coroutine_threadsafe(
+            self._execute(request, fn, args, on_done, dispatch), self.loop
+        )
+        return request
+
+    async def _execute(self, request, fn, args, on_done, dispatch):
+        waiting = True
+        self.queued += 1
+        try:
+            async with self.semaphore:
+                self.queued -= 1
+                waiting = False
+                if request.cancelled:
+                    return None
+                self.running += 1
+                try:
+                    return await self.loop.run_in_executor(self.executor, fn, *args, request.cancel_event)
+                finally:
+                    self.running -= 1
+        except asyncio.CancelledError:
+            logging.info(f"AI {request.name} cancelled")
+            return None
+        except Exception as e:
+            logging.error(f"AI {request.name} failed: {e}")
+            return None
+        finally:
+            if waiting:
+                self.queued -= 1
+            if on_done is None:
+                pass
+            elif dispatch is not None:
+                dispatch(on_done, request)
+            else:
+                on_done(request)
+
+    def stats(self):
+        return {'running': self.running, 'queued': self.queued, 'max_concurrent': self.max_concurrent}
+
+    def shutdown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker():
+    """Return the process-wide AI worker, starting it on first use"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = AIWorker()
+        return _worker
@@ -0,0 +1,159 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv # type: ignore
+from gemini_client import GeminiClient, POOL_SIZE, extract_text
+
+
+def read_prompts(path):
+    """Yield (line_number, id, prompt) for every non-empty input line"""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                yield line_number, line_number, record
+            else:
+                yield line_number, record.get("id", line_number), record.get("prompt") or record.get("text", "")
+
+
+def completed_lines(path):
+    """Input line numbers that already have a successful answer in the output file"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A crash can leave a half-written last line behind
+                continue
+            if record.get("error") is None:
+                done.add(record["line"])
+    return done
+
+
+def drop_torn_line(path):
+    """Cut a half-written last line off the output so appended records start on a fresh line"""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - 65536)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+        if position != end:
+            logging.warning(f"Dropping {end - position} bytes of a half-written line from {path}")
+            f.truncate(position)
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+class BatchRunner:
+    def __init__(self, client, concurrency=4, ordered=True):
+        self.client = client
+        self.concurrency = concurrency
+        self.ordered = ordered
+        self.latencies = []
+        self.errors = 0
+        self.lock = threading.Lock()
+
+    def answer(self, line_number, record_id, prompt):
+        """Run one prompt through the same generateContent path as the chat window"""
+        started = time.monotonic()
+        record = {"line": line_number, "id": record_id, "prompt": prompt, "response": None, "error": None}
+        try:
+            result = self.client.generate([{"role": "user", "parts": [{"text": prompt}]}], timeout=60)
+            record["response"] = extract_text(result)
+        except Exception as e:
+            record["error"] = str(e)
+        record["latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+        with self.lock:
+            self.latencies.append(record["latency_ms"])
+            if record["error"] is not None:
+                self.errors += 1
+        return record
+
+    def run(self, input_path, output_path):
+        done = completed_lines(output_path)
+        drop_torn_line(output_path)
+        prompts = [p for p in read_prompts(input_path) if p[0] not in done]
+        if done:
+            logging.info(f"Resuming: {len(done)} lines already answered, {len(prompts)} to go")
+
+        started = time.monotonic()
+        with open(output_path, "a", encoding="utf-8") as out, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {executor.submit(self.answer, *p): p[0] for p in prompts}
+            if self.ordered:
+                # Futures are created in input order, so waiting on them in order keeps the output ordered
+                completed = futures
+            else:
+                completed = as_completed(futures)
+            for future in completed:
+                out.write(json.dumps(future.result(), ensure_ascii=False) + "\n")
+                out.flush()
+
+        return self.summary(len(prompts), time.monotonic() - started)
+
+    def summary(self, count, elapsed):
+        return {
+            'requests': count,
+            'seconds': round(elapsed, 2),
+            'requests_per_second': round(count / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': percentile(self.latencies, 50),
+            'p95_ms': percentile(self.latencies, 95),
+            'errors': self.errors
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="nexusctl batch", description="Run prompts from a JSONL file through Gemini")
+    parser.add_argument("input", help="JSONL file with one prompt per line ({\"id\": ..., \"prompt\": ...} or a string)")
+    parser.add_argument("-o", "--output", help="JSONL file for answers (default: <input>.out.jsonl)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="requests in flight at once")
+    parser.add_argument("--unordered", action="store_true", help="write answers as they complete")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        print("GEMINI_API_KEY is not set", file=sys.stderr)
+        return 2
+
+    output = args.output or os.path.splitext(args.input)[0] + ".out.jsonl"
+    client = GeminiClient(api_key, pool_size=max(POOL_SIZE, args.concurrency))
+    runner = BatchRunner(client, concurrency=args.concurrency, ordered=not args.unordered)
+    summary = runner.run(args.input, output)
+    print(
+        f"{summary['requests']} requests in {summary['seconds']}s "
+        f"({summary['requests_per_second']} req/s), "
+        f"p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, "
+        f"{summary['errors']} errors -> {output}",
+        file=sys.stderr
+    )
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
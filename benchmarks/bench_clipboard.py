@@ -0,0 +1,155 @@
+"""Idle wake-ups and capture latency of the clipboard watcher.
+
+Compares the owner-change watcher the bot window uses now with the old
+loop that called wait_for_text() every 0.5 s. For each watcher it first
+sits idle and counts how often the process woke up (voluntary context
+switches, plus watcher callbacks) and how much CPU it used, then copies
+unique text with xclip and measures how long the watcher took to capture
+each copy (from just before xclip starts, so both include its startup).
+
+    python benchmarks/bench_clipboard.py --idle 30 --copies 20
+
+Needs an X display and xclip. The old loop is timed from a main-loop
+timeout rather than its own thread, because calling wait_for_text() off
+the GTK thread is what the watcher was replaced for; its wake-up rate and
+capture delay are the same.
+"""
+import sys
+import time
+import argparse
+import subprocess
+import statistics
+import psutil
+import gi
+gi.require_version('Gtk', '3.0')
+gi.require_version('Gdk', '3.0')
+from gi.repository import Gtk, Gdk, GLib
+
+POLL_INTERVAL_MS = 500
+
+
+class PollWatcher:
+    """The old watcher: read the clipboard every POLL_INTERVAL_MS and compare"""
+
+    name = "poll 0.5 s"
+
+    def __init__(self, clipboard, on_capture):
+        self.clipboard = clipboard
+        self.on_capture = on_capture
+        self.last_text = clipboard.wait_for_text() or ""
+        self.callbacks = 0
+        self.source = GLib.timeout_add(POLL_INTERVAL_MS, self.poll)
+
+    def poll(self):
+        self.callbacks += 1
+        text = self.clipboard.wait_for_text()
+        if text and text != self.last_text and text.strip():
+            self.last_text = text
+            self.on_capture(text)
+        return True
+
+    def stop(self):
+        GLib.source_remove(self.source)
+
+
+class OwnerChangeWatcher:
+    """The current watcher: request the text when the selection owner changes"""
+
+    name = "owner-change"
+
+    def __init__(self, clipboard, on_capture):
+        self.clipboard = clipboard
+        self.on_capture = on_capture
+        self.callbacks = 0
+        self.handler = clipboard.connect("owner-change", self.on_owner_change)
+
+    def on_owner_change(self, clipboard, event):
+        self.callbacks += 1
+        clipboard.request_text(self.on_text)
+
+    def on_text(self, clipboard, text):
+        if text and text.strip():
+            self.on_capture(text)
+
+    def stop(self):
+        self.clipboard.disconnect(self.handler)
+
+
+def run_loop(seconds, loop):
+    """Run the main loop for up to seconds; a capture quits it early"""
+    fired = []
+
+    def timeout():
+        fired.append(True)
+        loop.quit()
+        return False
+
+    source = GLib.timeout_add(max(int(seconds * 1000), 0), timeout)
+    loop.run()
+    if not fired:
+        GLib.source_remove(source)
+
+
+def measure(watcher_class, args):
+    clipboard = Gtk.Clipboard.get(Gdk.SELECTION_CLIPBOARD)
+    process = psutil.Process()
+    loop = GLib.MainLoop()
+    captured = {}
+
+    def on_capture(text):
+        captured.setdefault(text, time.perf_counter())
+        loop.quit()
+
+    watcher = watcher_class(clipboard, on_capture)
+
+    switches = process.num_ctx_switches().voluntary
+    cpu = sum(process.cpu_times()[:2])
+    callbacks = watcher.callbacks
+    run_loop(args.idle, loop)
+    idle = {
+        'wakeups': (process.num_ctx_switches().voluntary - switches) / args.idle,
+        'callbacks': (watcher.callbacks - callbacks) / args.idle,
+        'cpu_ms': (sum(process.cpu_times()[:2]) - cpu) * 1000 / args.idle,
+    }
+
+    latencies = []
+    missed = 0
+    for i in range(args.copies):
+        text = f"nexus clipboard benchmark {watcher_class.__name__} {i} {time.time()}"
+        started = time.perf_counter()
+        subprocess.run(["xclip", "-selection", "clipboard"], input=text.encode(), check=True)
+        deadline = started + args.timeout
+        while text not in captured and time.perf_counter() < deadline:
+            run_loop(deadline - time.perf_counter(), loop)
+        if text in captured:
+            latencies.append((captured[text] - started) * 1000)
+        else:
+            missed += 1
+        # Copies are spread out like a user's, not back to back
+        run_loop(args.gap, loop)
+
+    watcher.stop()
+    return idle, latencies, missed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark clipboard watcher wake-ups and capture latency")
+    parser.add_argument("--idle", type=float, default=20, help="seconds to sit idle per watcher")
+    parser.add_argument("--copies", type=int, default=20, help="copies to time per watcher")
+    parser.add_argument("--gap", type=float, default=0.3, help="seconds between copies")
+    parser.add_argument("--timeout", type=float, default=2.0, help="seconds before a copy counts as missed")
+    args = parser.parse_args(argv)
+
+    print(f"{'watcher':<14} {'wakeups/s':>10} {'callbacks/s':>12} {'cpu ms/s':>9} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'missed':>7}")
+    for watcher_class in (PollWatcher, OwnerChangeWatcher):
+        idle, latencies, missed = measure(watcher_class, args)
+        p50 = statistics.median(latencies) if latencies else float("nan")
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) >= 2 else p50
+        print(f"{watcher_class.name:<14} {idle['wakeups']:>10.1f} {idle['callbacks']:>12.1f} "
+              f"{idle['cpu_ms']:>9.2f} {p50:>7.1f} {p95:>7.1f} {missed:>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
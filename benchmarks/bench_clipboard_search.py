@@ -0,0 +1,108 @@
+"""Latency of fuzzy clipboard search on a long history.
+
+Fills a throwaway ClipboardStore with shell commands built from a small
+vocabulary, so every trigram is common and the index has to work hard,
+then times ClipboardStore.search for exact, typo'd, reordered and short
+queries. Prints p50/p99/max per query and overall, and exits non-zero if
+the overall p99 misses the target.
+
+    python benchmarks/bench_clipboard_search.py --entries 100000 --runs 50
+
+Needs no display.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from clipboard_store import ClipboardStore
+
+COMMANDS = [
+    "sudo apt install {pkg}", "sudo apt remove {pkg}", "sudo systemctl restart {pkg}",
+    "docker run -it --rm {pkg}", "docker compose up -d {pkg}", "git commit -m 'update {pkg}'",
+    "git push origin {branch}", "git checkout -b {branch}", "pip install {pkg}=={version}",
+    "journalctl -u {pkg} --since today", "kubectl logs deploy/{pkg} -n {branch}",
+    "ssh {user}@{host} 'tail -f /var/log/{pkg}.log'", "curl -s https://{host}/api/{pkg}",
+]
+WORDS = {
+    "pkg": ["docker", "nginx", "postgresql", "redis", "python3", "nodejs", "htop", "curl", "git", "vim"],
+    "branch": ["main", "dev", "staging", "feature", "hotfix", "release"],
+    "version": ["1.0.0", "2.3.1", "0.9.8", "3.11.4"],
+    "user": ["root", "admin", "deploy", "ubuntu"],
+    "host": ["web01", "db02", "example.com", "10.0.0.5", "build.local"],
+}
+QUERIES = [
+    "sudo apt install docker",
+    "sudo apt instal dokcer",
+    "install docker sudo",
+    "docker compose up",
+    "git push origin main",
+    "journalctl nginx",
+    "ssh deploy web01",
+    "kubectl logs",
+    "pip",
+    "zzz not there",
+]
+
+
+def make_entry(rng, i):
+    command = rng.choice(COMMANDS)
+    return command.format(**{key: rng.choice(values) for key, values in WORDS.items()}) + f"  # {i}"
+
+
+def fill(store, entries, seed):
+    rng = random.Random(seed)
+    store.set_max_entries(entries)
+    for i in range(entries):
+        store.add(make_entry(rng, i))
+    # Wait for the writer to index everything
+    while True:
+        with store.lock:
+            if not store.ops:
+                break
+        time.sleep(0.05)
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark clipboard history search latency")
+    parser.add_argument("--entries", type=int, default=100000, help="history entries to fill")
+    parser.add_argument("--runs", type=int, default=50, help="timed runs per query")
+    parser.add_argument("--target-ms", type=float, default=20.0, help="overall p99 to meet")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    path = os.path.join(tempfile.mkdtemp(prefix="nexus-bench-"), "clipboard.db")
+    store = ClipboardStore(path)
+    started = time.perf_counter()
+    fill(store, args.entries, args.seed)
+    print(f"filled {args.entries} entries in {time.perf_counter() - started:.1f} s")
+
+    everything = []
+    print(f"{'query':<26} {'results':>7} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7}")
+    for query in QUERIES:
+        store.search(query)  # warm the page cache
+        samples = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            results = store.search(query)
+            samples.append((time.perf_counter() - started) * 1000)
+        everything += samples
+        print(f"{query:<26} {len(results):>7} {statistics.median(samples):>7.1f} "
+              f"{percentile(samples, 99):>7.1f} {max(samples):>7.1f}")
+    p99 = percentile(everything, 99)
+    print(f"{'overall':<26} {'':>7} {statistics.median(everything):>7.1f} {p99:>7.1f} {max(everything):>7.1f}")
+    store.close()
+    return 0 if p99 <= args.target_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
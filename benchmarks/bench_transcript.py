@@ -0,0 +1,138 @@
+"""Insert and scroll cost of the chat transcript as the history grows.
+
+Appends messages through ChatTranscript into a throwaway ChatStore and
+reports, per block of messages, the median time of one append (including
+the layout it triggers), the median time to page back through history, the
+number of realized rows and the process RSS. With --baseline the same
+appends also go into a single growing TextView that scrolls to the end on
+every message, which is what the bot window did before.
+
+    python benchmarks/bench_transcript.py --messages 20000 --block 2000 --baseline
+
+Needs a display (GTK); the window is offscreen.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import psutil
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gtk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chat_store import ChatStore
+from transcript import ChatTranscript
+
+WORDS = ("the quick brown fox jumps over the lazy dog while the model explains "
+         "how memory usage grows with every message in a long session").split()
+
+
+def pump():
+    while Gtk.events_pending():
+        Gtk.main_iteration_do(False)
+
+
+def message_text(i):
+    return " ".join(WORDS[(i + j) % len(WORDS)] for j in range(12 + i % 40))
+
+
+def make_tag_table():
+    table = Gtk.TextTagTable()
+    for name in ("timestamp", "left", "right", "user", "bot"):
+        table.add(Gtk.TextTag.new(name))
+    return table
+
+
+def median_ms(samples):
+    return statistics.median(samples) * 1000 if samples else 0.0
+
+
+def page_back(transcript, pages):
+    """Time paging towards older messages, then return to the newest page"""
+    samples = []
+    for _ in range(pages):
+        started = time.perf_counter()
+        transcript.on_edge_reached(transcript, Gtk.PositionType.TOP)
+        pump()
+        samples.append(time.perf_counter() - started)
+    transcript.jump_to_latest()
+    pump()
+    return samples
+
+
+class Baseline:
+    """The old transcript: one TextView whose buffer only ever grows"""
+
+    def __init__(self, window):
+        self.view = Gtk.TextView()
+        self.view.set_wrap_mode(Gtk.WrapMode.WORD_CHAR)
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.add(self.view)
+        window.add(scrolled)
+        self.buffer = self.view.get_buffer()
+
+    def append(self, sender, text):
+        self.buffer.insert(self.buffer.get_end_iter(), f"{sender}: {text}\n\n")
+        self.view.scroll_to_iter(self.buffer.get_end_iter(), 0.0, False, 0.0, 1.0)
+
+
+def run(args):
+    process = psutil.Process()
+    path = os.path.join(tempfile.mkdtemp(prefix="nexus-bench-"), "chat.db")
+    store = ChatStore(path)
+    window = Gtk.OffscreenWindow()
+    window.set_default_size(300, 600)
+    transcript = ChatTranscript(store, make_tag_table())
+    window.add(transcript)
+    window.show_all()
+    pump()
+
+    baseline = None
+    if args.baseline:
+        baseline_window = Gtk.OffscreenWindow()
+        baseline_window.set_default_size(300, 600)
+        baseline = Baseline(baseline_window)
+        baseline_window.show_all()
+        pump()
+
+    print(f"{'messages':>9} {'insert ms':>10} {'page ms':>8} {'rows':>5} {'rss MiB':>8}"
+          + (f" {'baseline ms':>12}" if baseline else ""))
+    inserts, old_inserts = [], []
+    for i in range(1, args.messages + 1):
+        sender, alignment = ("You", "right") if i % 2 else ("Nexus", "left")
+        text = message_text(i)
+        started = time.perf_counter()
+        transcript.append(sender, text, alignment)
+        pump()
+        inserts.append(time.perf_counter() - started)
+        if baseline is not None:
+            started = time.perf_counter()
+            baseline.append(sender, text)
+            pump()
+            old_inserts.append(time.perf_counter() - started)
+
+        if i % args.block == 0:
+            pages = page_back(transcript, args.pages)
+            rss = process.memory_info().rss / 2 ** 20
+            print(f"{i:>9} {median_ms(inserts):>10.2f} {median_ms(pages):>8.2f} "
+                  f"{len(transcript.rows):>5} {rss:>8.1f}"
+                  + (f" {median_ms(old_inserts):>12.2f}" if baseline else ""))
+            inserts, old_inserts = [], []
+    store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark chat transcript insert and scroll cost")
+    parser.add_argument("--messages", type=int, default=12000, help="messages to append")
+    parser.add_argument("--block", type=int, default=1000, help="report every this many messages")
+    parser.add_argument("--pages", type=int, default=10, help="history pages loaded per report")
+    parser.add_argument("--baseline", action="store_true", help="also time the old single TextView")
+    run(parser.parse_args(argv))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+import os
+import re
+import time
+import atexit
+import logging
+import sqlite3
+import threading
+
+CHAT_PATH = os.path.expanduser('~/.local/share/nexusctl/chat_history.db')
+# Writes are grouped into one transaction per batch or per flush interval
+WRITE_BATCH = int(os.getenv('NEXUS_CHAT_WRITE_BATCH', '64'))
+FLUSH_INTERVAL = float(os.getenv('NEXUS_CHAT_FLUSH_INTERVAL', '0.5'))
+COLUMNS = "id, sender, text, alignment, timestamp"
+# Marks around matched words in search snippets
+MATCH_START = "\x02"
+MATCH_END = "\x03"
+# Only the newest matches are ranked, which keeps common words fast on long histories
+SEARCH_CANDIDATES = int(os.getenv('NEXUS_SEARCH_CANDIDATES', '500'))
+
+
+class ChatStore:
+    """Durable, append-only chat history in SQLite (WAL).
+
+    Ids are handed out in memory so appending never touches the disk on the
+    caller's thread; a writer thread inserts finished messages in batches.
+    Messages still being streamed stay unsaved until finish() is called, and
+    reads merge unsaved messages with the stored ones so callers see a single
+    ordered history. Readers and the writer use separate connections, which
+    WAL lets run side by side. An FTS5 index over the message text is kept
+    in step by triggers, so it is updated in the writer's transactions.
+    """
+
+    def __init__(self, path=CHAT_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.writer = sqlite3.connect(path, check_same_thread=False)
+        self.writer.execute("PRAGMA journal_mode=WAL")
+        self.writer.execute("PRAGMA synchronous=NORMAL")
+        self.writer.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY,
+                sender TEXT NOT NULL,
+                text TEXT NOT NULL,
+                alignment TEXT NOT NULL,
+                timestamp REAL NOT NULL
+            )
+        """)
+        indexed = self.writer.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'"
+        ).fetchone() is not None
+        self.writer.executescript("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                text, content='messages', content_rowid='id', prefix='2 3'
+            );
+            CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+                INSERT INTO messages_fts(rowid, text) VALUES (new.id, new.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+                INSERT INTO messages_fts(messages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE ON messages BEGIN
+                INSERT INTO messages_fts(messages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                INSERT INTO messages_fts(rowid, text) VALUES (new.id, new.text);
+            END;
+        """)
+        self.writer.commit()
+        self.reader = sqlite3.connect(path, check_same_thread=False)
+        self.read_lock = threading.Lock()
+
+        self.lock = threading.Condition()
+        self.next_id = (self.writer.execute("SELECT MAX(id) FROM messages").fetchone()[0] or 0) + 1
+        self.unsaved = {}
+        # History saved before the index existed is indexed by the writer thread
+        self.ops = [] if indexed else [("rebuild", None)]
+        self.closed = False
+        self.written = 0
+        self.batches = 0
+        self.thread = threading.Thread(target=self.write_loop, name="nexus-chat-writer", daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def _message(row):
+        return {'id': row[0], 'sender': row[1], 'text': row[2], 'alignment': row[3], 'timestamp': row[4]}
+
+    def append(self, sender, text, alignment, timestamp=None, live=False):
+        """Add a message and return a copy of it with its id.
+
+        A live message is only written once finish() is called.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            message = {'id': self.next_id, 'sender': sender, 'text': text,
+                       'alignment': alignment, 'timestamp': timestamp}
+            self.next_id += 1
+            self.unsaved[message['id']] = message
+            if not live:
+                self.queue(("insert", message['id']))
+        return dict(message)
+
+    def finish(self, message_id, text):
+        """Set the final text of a live message and write it.
+
+        A message that was already written gets its text rewritten.
+        """
+        with self.lock:
+            message = self.unsaved.get(message_id)
+            if message is not None:
+                message['text'] = text
+                self.queue(("insert", message_id))
+                return
+        rows = self._select("WHERE id = ?", (message_id,), "ASC", 1)
+        if not rows:
+            return
+        with self.lock:
+            message = self.unsaved.setdefault(message_id, self._message(rows[0]))
+            message['text'] = text
+            self.queue(("insert", message_id))
+
+    def delete(self, message_id):
+        with self.lock:
+            if self.unsaved.pop(message_id, None) is None:
+                self.queue(("delete", message_id))
+
+    def clear(self):
+        with self.lock:
+            self.unsaved.clear()
+            self.ops = [("clear", None)]
+            self.lock.notify()
+
+    def queue(self, op):
+        # Called with the lock held
+        self.ops.append(op)
+        if len(self.ops) >= WRITE_BATCH:
+            self.lock.notify()
+
+    def write_loop(self):
+        while True:
+            with self.lock:
+                if not self.ops and not self.closed:
+                    self.lock.wait(FLUSH_INTERVAL)
+                ops, self.ops = self.ops, []
+                rows = {
+                    message_id: tuple(self.unsaved[message_id][key]
+                                      for key in ('id', 'sender', 'text', 'alignment', 'timestamp'))
+                    for op, message_id in ops if op == "insert" and message_id in self.unsaved
+                }
+                closed = self.closed
+            if ops:
+                self.write(ops, rows)
+            if closed:
+                return
+
+    def write(self, ops, rows):
+        try:
+            with self.writer:
+                for op, message_id in ops:
+                    if op == "insert" and message_id in rows:
+                        # An upsert rather than REPLACE so the update trigger keeps the index right
+                        self.writer.execute(
+                            f"INSERT INTO messages ({COLUMNS}) VALUES (?, ?, ?, ?, ?) "
+                            "ON CONFLICT(id) DO UPDATE SET text = excluded.text",
+                            rows[message_id]
+                        )
+                    elif op == "delete":
+                        self.writer.execute("DELETE FROM messages WHERE id = ?", (message_id,))
+                    elif op == "clear":
+                        self.writer.execute("DELETE FROM messages")
+                    elif op == "rebuild":
+                        self.writer.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+        except sqlite3.Error as e:
+            logging.error(f"Saving chat history failed: {e}")
+            return
+        with self.lock:
+            for message_id, row in rows.items():
+                # Keep it if it changed again while the batch was being written
+                message = self.unsaved.get(message_id)
+                if message is not None and message['text'] == row[2]:
+                    del self.unsaved[message_id]
+            self.written += len(rows)
+            self.batches += 1
+
+    def _merge(self, rows, keep, newest_first, limit):
+        """Stored rows plus matching unsaved messages, oldest first"""
+        with self.lock:
+            unsaved = [dict(m) for m in self.unsaved.values() if keep(m['id'])]
+        messages = {m['id']: m for m in (self._message(row) for row in rows)}
+        messages.update((m['id'], m) for m in unsaved)
+        ids = sorted(messages, reverse=newest_first)[:limit]
+        return [messages[i] for i in sorted(ids)]
+
+    def _select(self, where, params, order, limit):
+        with self.read_lock:
+            return self.reader.execute(
+                f"SELECT {COLUMNS} FROM messages {where} ORDER BY id {order} LIMIT ?", (*params, limit)
+            ).fetchall()
+
+    def last_page(self, limit):
+        """The newest messages, oldest first"""
+        rows = self._select("", (), "DESC", limit)
+        return self._merge(rows, lambda i: True, True, limit)
+
+    def page_before(self, message_id, limit):
+        """Up to limit messages older than message_id, oldest first"""
+        rows = self._select("WHERE id < ?", (message_id,), "DESC", limit)
+        return self._merge(rows, lambda i: i < message_id, True, limit)
+
+    def page_after(self, message_id, limit):
+        """Up to limit messages newer than message_id, oldest first"""
+        rows = self._select("WHERE id > ?", (message_id,), "ASC", limit)
+        return self._merge(rows, lambda i: i > message_id, False, limit)
+
+    def search(self, query, limit=50):
+        """Messages matching every word of query (as prefixes), best match first.
+
+        The newest SEARCH_CANDIDATES matches are ranked by BM25, then recency.
+        Each result carries a 'snippet' with matches wrapped in MATCH_START
+        and MATCH_END. Messages not written yet are matched by substring and
+        listed first, being the newest.
+        """
+        words = re.findall(r"\w+", query.lower())
+        if not words:
+            return []
+        with self.lock:
+            unsaved = [dict(m) for m in self.unsaved.values()
+                       if all(word in m['text'].lower() for word in words)]
+        for message in unsaved:
+            message['snippet'] = message['text'][:120]
+        match = " ".join(f'"{word}"*' for word in words)
+        with self.read_lock:
+            rows = self.reader.execute(
+                f"SELECT m.id, m.sender, m.text, m.alignment, m.timestamp, "
+                f"snippet(messages_fts, 0, '{MATCH_START}', '{MATCH_END}', '…', 12), bm25(messages_fts) "
+                f"FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+                f"WHERE messages_fts MATCH ? ORDER BY messages_fts.rowid DESC LIMIT ?",
+                (match, SEARCH_CANDIDATES)
+            ).fetchall()
+        results = sorted(unsaved, key=lambda m: m['id'], reverse=True)
+        seen = {m['id'] for m in results}
+        # Lower BM25 is better; ties go to the newer message
+        for row in sorted(rows, key=lambda row: (row[6], -row[0])):
+            if row[0] not in seen:
+                message = self._message(row)
+                message['snippet'] = row[5]
+                results.append(message)
+        return results[:limit]
+
+    def stats(self):
+        with self.lock:
+            return {'unsaved': len(self.unsaved), 'queued': len(self.ops),
+                    'written': self.written, 'batches': self.batches}
+
+    def close(self):
+        """Write everything still queued and stop the writer"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.lock.notify()
+        self.thread.join()
+        self.writer.close()
+        with self.read_lock:
+            self.reader.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_chat_store():
+    """Return the process-wide chat history, shared by every bot window"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ChatStore()
+            atexit.register(_store.close)
+        return _store
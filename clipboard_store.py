@@ -0,0 +1,375 @@
+import os
+import zlib
+import atexit
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+
+CLIPBOARD_PATH = os.path.expanduser('~/.local/share/nexusctl/clipboard.db')
+DEFAULT_MAX_ENTRIES = int(os.getenv('NEXUS_CLIPBOARD_MAX_ENTRIES', '1000'))
+# Newest entries whose metadata is kept in memory, and the byte cap for cached text
+HEAD_SIZE = int(os.getenv('NEXUS_CLIPBOARD_HEAD', '200'))
+MEMORY_BYTES = int(os.getenv('NEXUS_CLIPBOARD_MEMORY_BYTES', str(4 * 1024 * 1024)))
+# Entries larger than this are stored zlib-compressed
+COMPRESS_BYTES = int(os.getenv('NEXUS_CLIPBOARD_COMPRESS_BYTES', '4096'))
+PREVIEW_CHARS = 80
+# Characters from the start of each entry that fuzzy search looks at
+INDEX_CHARS = int(os.getenv('NEXUS_CLIPBOARD_INDEX_CHARS', '1000'))
+# Fuzzy search: rows read from the index before scoring, the share of query
+# trigrams a match needs, and how much being new counts against match quality
+SEARCH_RESULTS = 30
+SEARCH_CANDIDATES = int(os.getenv('NEXUS_CLIPBOARD_SEARCH_CANDIDATES', '200'))
+# Most trigrams a query sends to the index; every one adds a posting list to merge
+SEARCH_GRAMS = int(os.getenv('NEXUS_CLIPBOARD_SEARCH_GRAMS', '6'))
+FUZZY_THRESHOLD = 0.5
+RECENCY_WEIGHT = 0.25
+
+
+def preview(text):
+    """First line of text, whitespace collapsed and cut to PREVIEW_CHARS"""
+    line = " ".join(text.strip().split("\n", 1)[0].split())
+    if len(line) > PREVIEW_CHARS or "\n" in text.strip():
+        line = line[:PREVIEW_CHARS] + "..."
+    return line
+
+
+def index_text(data):
+    return data[:INDEX_CHARS * 4].decode("utf-8", errors="ignore")[:INDEX_CHARS]
+
+
+def index_grams(needle, limit=SEARCH_GRAMS):
+    """Up to limit trigrams spread over needle for the index to match on.
+
+    Side-by-side trigrams cover the whole query with a third as many
+    posting lists; spreading the kept ones keeps both ends of the query.
+    """
+    grams = [needle[i:i + 3] for i in range(0, len(needle) - 2, 3)]
+    if (len(needle) - 3) % 3:
+        grams.append(needle[-3:])
+    if len(grams) > limit:
+        grams = [grams[round(i * (len(grams) - 1) / (limit - 1))] for i in range(limit)]
+    return list(dict.fromkeys(grams))
+
+
+class ClipboardStore:
+    """Persistent clipboard history, deduplicated by SHA-256 of the text.
+
+    Copying text that is already in the history moves it to the front instead
+    of adding it again. Only the newest HEAD_SIZE entries are indexed in
+    memory, newest last, and text is cached up to MEMORY_BYTES; everything
+    else stays on disk and is read on demand, so startup reads a fixed number
+    of rows however long the history is. Writes and trimming to the
+    configured maximum run on a writer thread.
+
+    Listeners are told about every change so views can update in place:
+    ("added", entry, moved) when an entry goes to the front, ("removed", sha)
+    when one leaves the in-memory head, and ("cleared",).
+    """
+
+    def __init__(self, path=CLIPBOARD_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                sha TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                compressed INTEGER NOT NULL,
+                preview TEXT NOT NULL,
+                data BLOB NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_seq ON entries (seq)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(entries)")]
+        if "body" not in columns:
+            self.db.execute("ALTER TABLE entries ADD COLUMN body TEXT NOT NULL DEFAULT ''")
+        # Trigram index over the start of each entry, kept in step by triggers
+        self.db.executescript("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+                body, content='entries', content_rowid='seq', tokenize='trigram'
+            );
+            CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+                INSERT INTO entries_fts(rowid, body) VALUES (new.seq, new.body);
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+                INSERT INTO entries_fts(entries_fts, rowid, body) VALUES ('delete', old.seq, old.body);
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_au AFTER UPDATE ON entries BEGIN
+                INSERT INTO entries_fts(entries_fts, rowid, body) VALUES ('delete', old.seq, old.body);
+                INSERT INTO entries_fts(rowid, body) VALUES (new.seq, new.body);
+            END;
+        """)
+        self.db.commit()
+        # The writer thread owns self.db; lookups use their own connection and lock,
+        # so a search never holds up add()
+        self.reader = sqlite3.connect(path, check_same_thread=False)
+        self.read_lock = threading.Lock()
+        self.lock = threading.Condition()
+
+        row = self.db.execute("SELECT value FROM settings WHERE key = 'max_entries'").fetchone()
+        self.max_entries = int(row[0]) if row else DEFAULT_MAX_ENTRIES
+        self.next_seq = (self.db.execute("SELECT MAX(seq) FROM entries").fetchone()[0] or 0) + 1
+        self.head = OrderedDict()
+        for sha, seq, size, text_preview in reversed(self.db.execute(
+            "SELECT sha, seq, size, preview FROM entries ORDER BY seq DESC LIMIT ?", (HEAD_SIZE,)
+        ).fetchall()):
+            self.head[sha] = {'sha': sha, 'seq': seq, 'size': size, 'preview': text_preview}
+        self.texts = OrderedDict()
+        self.cached_bytes = 0
+        # Entries saved before the index existed are indexed by the writer thread
+        self.ops = [] if "body" in columns else [("reindex", None, None)]
+        self.closed = False
+        self.listeners = []
+        self.thread = threading.Thread(target=self.write_loop, name="nexus-clipboard-store", daemon=True)
+        self.thread.start()
+
+    def add(self, text):
+        """Put text at the front of the history and return its entry"""
+        data = text.encode("utf-8")
+        sha = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            entry = self.head.pop(sha, None)
+            moved = entry is not None
+            if entry is None:
+                entry = {'sha': sha, 'size': len(data), 'preview': preview(text)}
+            entry['seq'] = self.next_seq
+            self.next_seq += 1
+            self.head[sha] = entry
+            evicted = []
+            while len(self.head) > HEAD_SIZE:
+                evicted.append(self.head.popitem(last=False)[0])
+            self.ops.append(("add", entry, data))
+            self.lock.notify()
+            added = dict(entry)
+        self.cache_text(sha, text)
+        self.notify("added", added, moved)
+        for old in evicted:
+            self.notify("removed", old)
+        return added
+
+    def add_listener(self, callback):
+        """callback(event, *args) is called from the changing thread on every change"""
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def notify(self, event, *args):
+        for callback in list(self.listeners):
+            try:
+                callback(event, *args)
+            except Exception as e:
+                logging.error(f"Clipboard listener failed: {e}")
+
+    def cache_text(self, sha, text):
+        size = len(text.encode("utf-8"))
+        if size > MEMORY_BYTES:
+            return
+        with self.lock:
+            if sha in self.texts:
+                self.texts.move_to_end(sha)
+                return
+            self.texts[sha] = text
+            self.cached_bytes += size
+            while self.cached_bytes > MEMORY_BYTES:
+                _, dropped = self.texts.popitem(last=False)
+                self.cached_bytes -= len(dropped.encode("utf-8"))
+
+    def text(self, sha):
+        """Full text of an entry, from memory or disk; None if it is gone"""
+        with self.lock:
+            text = self.texts.get(sha)
+            if text is not None:
+                self.texts.move_to_end(sha)
+                return text
+            # Still waiting for the writer, so not on disk yet
+            for op, entry, data in self.ops:
+                if op == "add" and entry['sha'] == sha:
+                    return data.decode("utf-8")
+        with self.read_lock:
+            row = self.reader.execute("SELECT compressed, data FROM entries WHERE sha = ?", (sha,)).fetchone()
+        if row is None:
+            return None
+        compressed, data = row
+        text = (zlib.decompress(data) if compressed else data).decode("utf-8")
+        self.cache_text(sha, text)
+        return text
+
+    def recent(self, limit):
+        """Newest entries first, at most limit and never more than HEAD_SIZE"""
+        with self.lock:
+            return [dict(entry) for entry in reversed(self.head.values())][:limit]
+
+    def page(self, before_seq, limit):
+        """Entries older than before_seq (None for the newest), newest first"""
+        before_seq = self.next_seq if before_seq is None else before_seq
+        with self.lock:
+            entries = [dict(entry) for entry in reversed(self.head.values()) if entry['seq'] < before_seq]
+            known = set(self.head)
+        if len(entries) < limit:
+            oldest = min((entry['seq'] for entry in entries), default=before_seq)
+            with self.read_lock:
+                rows = self.reader.execute(
+                    "SELECT sha, seq, size, preview FROM entries WHERE seq < ? ORDER BY seq DESC LIMIT ?",
+                    (oldest, limit - len(entries))
+                ).fetchall()
+            # Entries in the head were moved to the front since they were saved
+            entries += [{'sha': sha, 'seq': seq, 'size': size, 'preview': text_preview}
+                        for sha, seq, size, text_preview in rows if sha not in known]
+        return entries[:limit]
+
+    def search(self, query, limit=SEARCH_RESULTS):
+        """Entries matching query best first, each with a 'score'.
+
+        Exact substring matches score highest. Otherwise entries are fuzzy
+        matched on the share of the query's trigrams they contain, which
+        tolerates typos and reordered words. Newer entries get a small boost.
+        Queries under three characters only look at the in-memory head.
+
+        The index only sees a few spread-out trigrams (index_grams) and every
+        pass stops after SEARCH_CANDIDATES rows, so the cost is bounded by
+        neither the query length nor the history size: the newest entries
+        with all of them are read first, and only when those hold fewer than
+        limit exact matches also the newest with any of them.
+        """
+        needle = query.strip().lower()
+        if not needle:
+            return []
+        with self.lock:
+            head = [dict(entry) for entry in reversed(self.head.values())]
+            newest = self.next_seq
+        found = {}
+
+        def consider(entry, quality):
+            score = quality + RECENCY_WEIGHT * entry['seq'] / newest
+            if score > found.get(entry['sha'], {}).get('score', -1):
+                entry['score'] = score
+                found[entry['sha']] = entry
+
+        for entry in head:
+            if needle in entry['preview'].lower():
+                consider(entry, 2.0)
+        grams = {needle[i:i + 3] for i in range(len(needle) - 2)}
+        if grams:
+            quoted = ['"' + gram.replace('"', '""') + '"' for gram in index_grams(needle)]
+            # Walking the index newest first lets every query stop after LIMIT rows;
+            # ranking all OR matches by BM25 instead takes hundreds of ms on long histories
+            query_sql = ("SELECT e.sha, e.seq, e.size, e.preview, e.body FROM entries_fts f "
+                         "JOIN entries e ON e.seq = f.rowid WHERE entries_fts MATCH ? "
+                         "ORDER BY f.rowid DESC LIMIT ?")
+            with self.read_lock:
+                # Every exact match has all the trigrams, so it is among these
+                candidates = self.reader.execute(query_sql, (" AND ".join(quoted), SEARCH_CANDIDATES)).fetchall()
+                exact = sum(needle in row[4].lower() for row in candidates)
+                if exact < limit:
+                    candidates += self.reader.execute(query_sql, (" OR ".join(quoted), SEARCH_CANDIDATES)).fetchall()
+            for sha, seq, size, text_preview, body in candidates:
+                body = body.lower()
+                if needle in body:
+                    quality = 2.0
+                else:
+                    quality = sum(gram in body for gram in grams) / len(grams)
+                if quality >= FUZZY_THRESHOLD:
+                    consider({'sha': sha, 'seq': seq, 'size': size, 'preview': text_preview}, quality)
+        return sorted(found.values(), key=lambda entry: entry['score'], reverse=True)[:limit]
+
+    def set_max_entries(self, count):
+        """Change and save how many entries are kept; older ones are dropped"""
+        with self.lock:
+            self.max_entries = count
+            self.ops.append(("limit", None, None))
+            self.lock.notify()
+
+    def clear(self):
+        with self.lock:
+            self.head.clear()
+            self.texts.clear()
+            self.cached_bytes = 0
+            self.ops = [("clear", None, None)]
+            self.lock.notify()
+        self.notify("cleared")
+
+    def write_loop(self):
+        while True:
+            with self.lock:
+                while not self.ops and not self.closed:
+                    self.lock.wait()
+                ops, self.ops = self.ops, []
+                max_entries = self.max_entries
+                closed = self.closed
+            if ops:
+                self.write(ops, max_entries)
+            if closed:
+                return
+
+    def write(self, ops, max_entries):
+        try:
+            with self.db:
+                for op, entry, data in ops:
+                    if op == "add":
+                        compressed = len(data) > COMPRESS_BYTES
+                        self.db.execute(
+                            "INSERT INTO entries (sha, seq, size, compressed, preview, data, body) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(sha) DO UPDATE SET seq = excluded.seq",
+                            (entry['sha'], entry['seq'], entry['size'], int(compressed), entry['preview'],
+                             zlib.compress(data) if compressed else data, index_text(data))
+                        )
+                    elif op == "clear":
+                        self.db.execute("DELETE FROM entries")
+                    elif op == "reindex":
+                        rows = self.db.execute(
+                            "SELECT sha, compressed, data FROM entries WHERE body = ''"
+                        ).fetchall()
+                        for sha, compressed, data in rows:
+                            self.db.execute("UPDATE entries SET body = ? WHERE sha = ?",
+                                            (index_text(zlib.decompress(data) if compressed else data), sha))
+                    elif op == "limit":
+                        self.db.execute(
+                            "INSERT OR REPLACE INTO settings (key, value) VALUES ('max_entries', ?)",
+                            (str(max_entries),)
+                        )
+                # Everything older than the newest max_entries goes
+                self.db.execute(
+                    "DELETE FROM entries WHERE seq <= "
+                    "(SELECT seq FROM entries ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                    (max_entries,)
+                )
+        except sqlite3.Error as e:
+            logging.error(f"Saving clipboard history failed: {e}")
+            return
+        with self.lock:
+            trimmed = list(self.head)[:max(len(self.head) - max_entries, 0)]
+            for sha in trimmed:
+                del self.head[sha]
+        for sha in trimmed:
+            self.notify("removed", sha)
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.lock.notify()
+        self.thread.join()
+        self.db.close()
+        with self.read_lock:
+            self.reader.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_clipboard_store():
+    """Return the process-wide clipboard history"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ClipboardStore()
+            atexit.register(_store.close)
+        return _store
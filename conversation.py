@@ -0,0 +1,101 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+
+TOKEN_BUDGET = int(os.getenv('NEXUS_TOKEN_BUDGET', '2000'))
+RECENT_TURNS = int(os.getenv('NEXUS_RECENT_TURNS', '6'))
+SUMMARY_LINE_CHARS = 160
+
+
+def estimate_tokens(text):
+    """Rough local token estimate (about four characters per token for English text)"""
+    if not text:
+        return 0
+    return max(len(text) // 4, len(text.split()))
+
+
+def first_sentence(text, limit=SUMMARY_LINE_CHARS):
+    text = re.sub(r"\s+", " ", text).strip()
+    match = re.match(r"(.+?[.!?])(\s|$)", text)
+    sentence = match.group(1) if match else text
+    return sentence if len(sentence) <= limit else sentence[:limit - 3].rstrip() + "..."
+
+
+class ConversationContext:
+    """Keeps recent turns verbatim and folds older ones into a rolling summary.
+
+    Every request built from it stays under the token budget: the oldest
+    verbatim turns are folded first, then the oldest summary lines are dropped.
+    """
+
+    def __init__(self, token_budget=TOKEN_BUDGET, recent_turns=RECENT_TURNS):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summary = []
+        self.turns = []
+        self.lock = threading.Lock()
+        self.last_request = {'turns': 0, 'tokens': 0, 'bytes': 0}
+
+    def add_exchange(self, question, answer):
+        """Record a question and its answer"""
+        with self.lock:
+            self.turns.append(("user", question))
+            self.turns.append(("model", answer))
+            while len(self.turns) > self.recent_turns:
+                self._fold_oldest()
+
+    def _fold_oldest(self):
+        role, text = self.turns.pop(0)
+        speaker = "User asked" if role == "user" else "Assistant answered"
+        self.summary.append(f"{speaker}: {first_sentence(text)}")
+
+    def _summary_text(self):
+        if not self.summary:
+            return ""
+        return "Summary of the earlier conversation:\n" + "\n".join(self.summary)
+
+    def _tokens(self, query):
+        total = estimate_tokens(query) + estimate_tokens(self._summary_text())
+        return total + sum(estimate_tokens(text) for _, text in self.turns)
+
+    def build_contents(self, query):
+        """Return the Gemini contents list for a new question"""
+        with self.lock:
+            while self._tokens(query) > self.token_budget and self.turns:
+                self._fold_oldest()
+            while self._tokens(query) > self.token_budget and self.summary:
+                self.summary.pop(0)
+
+            contents = []
+            summary = self._summary_text()
+            if summary:
+                contents.append({"role": "user", "parts": [{"text": summary}]})
+                contents.append({"role": "model", "parts": [{"text": "Understood."}]})
+            for role, text in self.turns:
+                contents.append({"role": role, "parts": [{"text": text}]})
+            contents.append({"role": "user", "parts": [{"text": query}]})
+
+            self.last_request = {
+                'turns': len(contents),
+                'tokens': self._tokens(query),
+                'bytes': len(json.dumps({"contents": contents}).encode("utf-8"))
+            }
+        logging.info(f"Gemini request: {self.last_request['turns']} turns, "
+                     f"~{self.last_request['tokens']} tokens, {self.last_request['bytes']} bytes")
+        return contents
+
+    def fingerprint(self):
+        """Hash of the latest exchange, used to key caches on conversation context"""
+        with self.lock:
+            if not self.turns and not self.summary:
+                return ""
+            recent = json.dumps([self.summary[-2:], self.turns[-2:]])
+        return hashlib.sha256(recent.encode("utf-8")).hexdigest()[:16]
+
+    def clear(self):
+        with self.lock:
+            self.summary.clear()
+            self.turns.clear()
@@ -223,7 +223,7 @@ EOF
 
 # Copy application files
 echo -e "${YELLOW}Copying application files...${NC}"
-cp -r main.py nexus.py about.py help.py logo.png debian/usr/lib/nexusctl/
+cp -r main.py nexus.py about.py help.py gemini_client.py response_cache.py similarity.py singleflight.py ai_worker.py conversation.py resilience.py hedging.py batch.py offline_queue.py tracing.py providers.py intents.py chat_store.py transcript.py ui_queue.py markdown_render.py prompt_history.py clipboard_store.py paste_engine.py logo.png debian/usr/lib/nexusctl/
 
 # Copy icon
 cp logo.png debian/usr/share/icons/hicolor/256x256/apps/nexusctl.png
@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+import tracing
+from resilience import (TokenBucket, CircuitBreaker, RateLimitedError, RETRYABLE_STATUS, MAX_RETRIES,
+                        MAX_RETRY_AFTER, parse_retry_after, backoff_delay)
+from hedging import LatencyTracker, Hedger, HEDGE_ENABLED
+
+# GEMINI_BASE_URL can point at a local stand-in server; use REQUESTS_CA_BUNDLE for its certificate
+GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL', 'https://generativelanguage.googleapis.com').rstrip('/')
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-1.5-flash')
+POOL_SIZE = int(os.getenv('NEXUS_POOL_SIZE', '4'))
+
+
+class RequestCancelled(Exception):
+    """Raised when a request is cancelled while waiting to be sent or retried"""
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        # DNS, TCP and (for HTTPS) TLS of a new pooled connection
+        tracing.add_span("connect", started)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        tracing.add_span("connect", started)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TracingAdapter(HTTPAdapter):
+    """HTTPAdapter whose new connections report their setup time to the active trace"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool
+        }
+
+
+def extract_text(result):
+    """Pull the answer text out of a Gemini response or stream chunk"""
+    candidates = result.get("candidates", [])
+    if candidates:
+        parts = candidates[0].get("content", {}).get("parts", [{}])
+        return "".join(part.get("text", "") for part in parts)
+    return ""
+
+
+class GeminiClient:
+    """Long-lived HTTP client with keep-alive pooling for all Gemini requests"""
+
+    def __init__(self, api_key, base_url=GEMINI_BASE_URL, model=GEMINI_MODEL, pool_size=POOL_SIZE):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.adapter = TracingAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        # The key goes in a header so it never appears in URLs, which end up in error messages
+        self.session.headers.update({'Content-Type': 'application/json', 'x-goog-api-key': api_key or ''})
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.limiter = TokenBucket()
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.hedger = Hedger(self.latency) if HEDGE_ENABLED else None
+
+    def model_url(self, method):
+        return f"{self.base_url}/v1beta/models/{self.model}:{method}"
+
+    def post(self, method, params, contents, cancel=None, stream=False, timeout=10):
+        """POST through the rate limiter, retry policy and circuit breaker.
+
+        Connection failures, 429 and 5xx responses are retried with jittered
+        exponential backoff (honouring Retry-After). Read timeouts are not
+        retried so a slow answer does not turn into several slow answers.
+        RateLimitedError is raised rather than waiting more than
+        MAX_RETRY_AFTER for the rate limit.
+        """
+        attempt = 0
+        while True:
+            self.breaker.before_request()
+            if not self.limiter.acquire(cancel):
+                self.breaker.release()
+                if cancel is not None and cancel.is_set():
+                    raise RequestCancelled("Request cancelled while rate limited")
+                raise RateLimitedError(self.limiter.blocked_for())
+
+            retry_after = None
+            started = time.perf_counter()
+            try:
+                response = self.session.post(
+                    self.model_url(method),
+                    params=params,
+                    json={"contents": contents},
+                    stream=stream,
+                    timeout=timeout
+                )
+            except requests.exceptions.ConnectionError as e:
+                self.breaker.record_failure(e)
+                if attempt >= MAX_RETRIES:
+                    raise
+            except requests.exceptions.Timeout as e:
+                self.breaker.record_failure(e)
+                raise
+            else:
+                tracing.add_span("ttfb", started)
+                if response.status_code not in RETRYABLE_STATUS:
+                    # Any other answer, including a 4xx, means the endpoint is up
+                    self.breaker.record_success()
+                    self.limiter.on_success()
+                    response.raise_for_status()
+                    return response
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if response.status_code == 429:
+                    self.breaker.release()
+                    self.limiter.on_throttled(retry_after)
+                    if retry_after is not None and retry_after > MAX_RETRY_AFTER:
+                        response.close()
+                        raise RateLimitedError(retry_after)
+                else:
+                    self.breaker.record_failure()
+                response.close()
+                if attempt >= MAX_RETRIES:
+                    response.raise_for_status()
+
+            delay = max(backoff_delay(attempt), retry_after or 0)
+            attempt += 1
+            logging.warning(f"Gemini {method} failed, retry {attempt}/{MAX_RETRIES} in {delay:.1f}s")
+            if cancel is not None and cancel.wait(delay):
+                raise RequestCancelled("Request cancelled during retry")
+            elif cancel is None:
+                time.sleep(delay)
+
+    def generate(self, contents, cancel=None, timeout=10):
+        """Call generateContent and return the decoded JSON response"""
+        if self.hedger is None:
+            return self._generate(contents, cancel, timeout)
+        trace = tracing.current()
+
+        def attempt(attempt_cancel):
+            tracing.activate(trace)
+            return self._generate(contents, attempt_cancel, timeout)
+
+        result = self.hedger.run(attempt, cancel)
+        if result is None:
+            raise RequestCancelled("Request cancelled")
+        return result
+
+    def _generate(self, contents, cancel, timeout):
+        started = time.monotonic()
+        response = self.post("generateContent", {}, contents, cancel, stream=True, timeout=timeout)
+        with tracing.span("download"):
+            body = response.content
+        with tracing.span("parse"):
+            result = json.loads(body)
+        self.latency.record(time.monotonic() - started)
+        return result
+
+    def stream(self, contents, cancel=None, timeout=(5, 30)):
+        """Call streamGenerateContent and yield each decoded SSE chunk"""
+        with self.post("streamGenerateContent", {'alt': 'sse'}, contents, cancel,
+                       stream=True, timeout=timeout) as response:
+            # SSE is always UTF-8; requests would otherwise assume ISO-8859-1 for text/event-stream
+            response.encoding = 'utf-8'
+            started = time.perf_counter()
+            parsing = 0.0
+            try:
+                for line in response.iter_lines(decode_unicode=True):
+                    if cancel is not None and cancel.is_set():
+                        return
+                    if line and line.startswith("data:"):
+                        parse_started = time.perf_counter()
+                        chunk = json.loads(line[5:])
+                        parsing += time.perf_counter() - parse_started
+                        yield chunk
+            finally:
+                ended = time.perf_counter()
+                tracing.add_span("download", started, ended)
+                tracing.add_span("parse", ended - parsing, ended)
+
+    def prewarm(self):
+        """Open the TLS connection in the background so the first message skips the handshake"""
+        def warm():
+            started = time.monotonic()
+            try:
+                self.session.head(self.base_url, timeout=5)
+                logging.info(f"Gemini connection pre-warmed in {(time.monotonic() - started) * 1000:.0f} ms")
+            except Exception as e:
+                logging.warning(f"Connection pre-warm failed: {e}")
+
+        threading.Thread(target=warm, daemon=True).start()
+
+    def connection_stats(self):
+        """Report how many requests reused an already open connection"""
+        requests_made = 0
+        connections = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                requests_made += pool.num_requests
+                connections += pool.num_connections
+        reused = max(requests_made - connections, 0)
+        return {
+            'requests': requests_made,
+            'connections': connections,
+            'reused': reused,
+            'reuse_ratio': reused / requests_made if requests_made else 0.0
+        }
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client(api_key):
+    """Return the process-wide Gemini client, creating it on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GeminiClient(api_key)
+        return _client
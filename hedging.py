@@ -0,0 +1,126 @@
+import os
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+HEDGE_ENABLED = os.getenv('NEXUS_HEDGE', '0') == '1'
+HEDGE_MAX_RATIO = float(os.getenv('NEXUS_HEDGE_MAX_RATIO', '0.1'))
+HEDGE_PERCENTILE = float(os.getenv('NEXUS_HEDGE_PERCENTILE', '95'))
+HEDGE_MIN_SAMPLES = 20
+
+
+class LatencyTracker:
+    """Sliding window of recent request latencies"""
+
+    def __init__(self, size=200):
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, p):
+        with self.lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return None
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def __len__(self):
+        with self.lock:
+            return len(self.samples)
+
+
+class Hedger:
+    """Sends a second identical request when the first is slower than the observed p95.
+
+    Whichever attempt succeeds first wins; the other one has its cancel event
+    set so it stops retrying and its result is discarded. Extra requests are
+    capped at max_ratio of all hedged calls.
+    """
+
+    def __init__(self, tracker, max_ratio=HEDGE_MAX_RATIO, percentile=HEDGE_PERCENTILE,
+                 min_samples=HEDGE_MIN_SAMPLES):
+        self.tracker = tracker
+        self.max_ratio = max_ratio
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _hedge_allowed(self):
+        with self.lock:
+            if self.hedges + 1 > self.max_ratio * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    def run(self, fn, cancel=None):
+        """Call fn(cancel_event), hedging it when it is slow; returns its result"""
+        with self.lock:
+            self.calls += 1
+        delay = None
+        if len(self.tracker) >= self.min_samples:
+            delay = self.tracker.percentile(self.percentile)
+
+        attempts = {}
+        primary_cancel = threading.Event()
+        attempts[self.executor.submit(fn, primary_cancel)] = ("primary", primary_cancel)
+        hedged = False
+        waited = 0.0
+        pending = set(attempts)
+        first_error = None
+
+        try:
+            while pending:
+                timeout = 0.1
+                if not hedged and delay is not None:
+                    timeout = min(timeout, max(delay - waited, 0.0))
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                waited += timeout
+                for future in done:
+                    error = future.exception()
+                    if error is None:
+                        name, _ = attempts[future]
+                        if name == "hedge":
+                            with self.lock:
+                                self.hedge_wins += 1
+                        return future.result()
+                    first_error = first_error or error
+                if cancel is not None and cancel.is_set():
+                    break
+                if (not hedged and delay is not None and waited >= delay and pending
+                        and self._hedge_allowed()):
+                    hedged = True
+                    hedge_cancel = threading.Event()
+                    future = self.executor.submit(fn, hedge_cancel)
+                    attempts[future] = ("hedge", hedge_cancel)
+                    pending.add(future)
+                    logging.info(f"Hedging slow Gemini request after {delay * 1000:.0f} ms; {self.report()}")
+        finally:
+            for _, attempt_cancel in attempts.values():
+                attempt_cancel.set()
+
+        if first_error is not None:
+            raise first_error
+        return None
+
+    def stats(self):
+        with self.lock:
+            return {
+                'calls': self.calls,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'win_rate': self.hedge_wins / self.hedges if self.hedges else 0.0
+            }
+
+    def report(self):
+        stats = self.stats()
+        return (f"hedges {stats['hedges']}/{stats['calls']} calls, "
+                f"won {stats['hedge_wins']} ({stats['win_rate']:.0%})")
@@ -0,0 +1,112 @@
+import re
+import logging
+import threading
+
+RESOURCE = r"(ram|memory|cpu|processor|disk|storage)( space)?"
+NOW = r"( (right now|now|on (this|my) (pc|computer|machine|laptop|system)))?"
+PROGRAM = r"(window|app|application|program)"
+
+# (intent, slash commands, patterns); the first matching rule wins
+RULES = [
+    ("system", ("/sys", "/system"), (
+        # Status questions only, such as "what's my cpu usage" or "how much ram is free"
+        rf"^((what'?s|what is|show( me)?|check|get|tell me) )?((my|the) )?(current )?{RESOURCE} "
+        rf"(usage|use|load|utilization|status){NOW}$",
+        rf"^how much (free )?{RESOURCE}( (is|are|am i|do i have|have i))?"
+        rf"( (free|left|used|available|in use|being used|using|remaining))?{NOW}$",
+        rf"^(free|available|used|remaining) {RESOURCE}( left)?{NOW}$",
+        r"^system (info|information|status|stats)$",
+    )),
+    ("window", ("/win", "/window"), (
+        # Only about the window in front, such as "what window is this" or "which app am i using"
+        rf"^(what|which) {PROGRAM} (is (this|open|active|focused|in focus)|am i (using|in)){NOW}$",
+        rf"^(what'?s|what is) (the |my )?(active|current|focused) {PROGRAM}{NOW}$",
+        rf"^(active|current|focused) {PROGRAM}$",
+    )),
+    ("update", ("/update", "/upgrade"), (
+        r"^(please )?(update|upgrade)( and upgrade)?( my| the)? (system|computer|machine|os|packages|pc)$",
+        r"^(run|start) (an? )?(system )?(update|upgrade)s?$",
+    )),
+]
+
+# How-to questions, explanations and requests for code or advice mention the
+# same words but need a real answer
+HOW_TO = re.compile(
+    r"^(how (do|can|could|should|would|to)|why|explain|what causes)\b"
+    r"|\b(write|script|code|best way|should i|enough|recommend)\b"
+)
+# Longer messages are real questions even when they match a rule
+MAX_WORDS = 10
+
+
+class IntentRouter:
+    """Keyword/regex and slash-command classifier for questions answered locally"""
+
+    def __init__(self, rules=RULES):
+        self.commands = {}
+        self.patterns = []
+        for intent, commands, patterns in rules:
+            for command in commands:
+                self.commands[command] = intent
+            self.patterns.extend((intent, re.compile(pattern)) for pattern in patterns)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def classify(self, text):
+        """Return the intent name for text, or None to fall through to the network"""
+        normalized = re.sub(r"\s+", " ", text.strip().lower()).rstrip("?!. ")
+        intent = None
+        if normalized.startswith("/"):
+            intent = self.commands.get(normalized.split(" ", 1)[0])
+        elif len(normalized.split()) <= MAX_WORDS and not HOW_TO.search(normalized):
+            for name, pattern in self.patterns:
+                if pattern.search(normalized):
+                    intent = name
+                    break
+
+        with self.lock:
+            if intent is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            total = self.hits + self.misses
+            ratio = self.hits / total
+        logging.info(f"Local intent {intent or 'miss'}; handled locally {self.hits}/{total} ({ratio:.0%})")
+        return intent
+
+
+# Phrasings the rules must get right; run this module to check them
+EXAMPLES = [
+    ("what's my cpu usage", "system"),
+    ("how much ram is free", "system"),
+    ("how much memory am i using", "system"),
+    ("free disk space", "system"),
+    ("system info", "system"),
+    ("what window is this", "window"),
+    ("which app am i using", "window"),
+    ("what is the active window", "window"),
+    ("active window", "window"),
+    ("update my system", "update"),
+    ("/sys", "system"),
+    ("write a python script that prints cpu usage", None),
+    ("what is the best way to free disk space", None),
+    ("my laptop has 8gb ram, is that enough memory to use docker", None),
+    ("how much ram do i need for docker", None),
+    ("which app should i use to open pdfs", None),
+    ("which window manager am i using", None),
+    ("what program can open this file", None),
+    ("which program opens this file type", None),
+    ("what application is this error from", None),
+    ("what application is best for this task", None),
+]
+
+
+if __name__ == "__main__":
+    router = IntentRouter()
+    results = [(text, expected, router.classify(text)) for text, expected in EXAMPLES]
+    failed = [result for result in results if result[1] != result[2]]
+    for text, expected, got in failed:
+        print(f"{text!r}: expected {expected}, got {got}")
+    print(f"{len(EXAMPLES) - len(failed)}/{len(EXAMPLES)} examples classified as expected")
+    raise SystemExit(1 if failed else 0)
@@ -1,8 +1,16 @@
+import sys
+
+# Headless batch mode: nexusctl batch prompts.jsonl. Dispatched before the
+# desktop stack (Gtk, AppIndicator, notify2, nexus) is imported, so it runs
+# on machines without it.
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] == "batch":
+    from batch import main as batch_main
+    sys.exit(batch_main(sys.argv[2:]))
+
 import gi
 gi.require_version('Gtk', '3.0')
 gi.require_version('AppIndicator3', '0.1')
 from gi.repository import Gtk, AppIndicator3, GLib, Gdk, Gio
-import sys
 import logging
 import notify2
 import time
@@ -416,7 +424,7 @@ class Nexus:
 
     # Nexus Bot
     def nexus_bot(self, _):
-        bot = NexusBot()
+        bot = NexusBot(controller=self)
         bot.show_all()
 
     # Help
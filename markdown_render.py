@@ -0,0 +1,219 @@
+import os
+import atexit
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+import markdown
+
+RENDER_CACHE_SIZE = int(os.getenv('NEXUS_RENDER_CACHE', '256'))
+HEADINGS = {"h1": "h1", "h2": "h2", "h3": "h3", "h4": "h3", "h5": "h3", "h6": "h3"}
+INLINE = {"strong": "bold", "b": "bold", "em": "italic", "i": "italic", "code": "code", "a": "link"}
+# Tags Markdown itself produces; anything else is raw HTML from the text and is shown as written
+MARKDOWN_TAGS = set(HEADINGS) | set(INLINE) | {"p", "pre", "ul", "ol", "li", "br", "hr", "blockquote", "img"}
+
+
+class RunBuilder(HTMLParser):
+    """Turns the HTML produced by Markdown into (text, tag names) runs"""
+
+    def __init__(self):
+        super().__init__()
+        self.runs = []
+        self.tags = []
+        self.lists = []
+        self.links = []
+        self.pre = 0
+
+    def emit(self, text):
+        if not text:
+            return
+        for link in self.links:
+            link[1] += text
+        tags = tuple(self.tags)
+        if self.runs and self.runs[-1][1] == tags:
+            self.runs[-1] = (self.runs[-1][0] + text, tags)
+        else:
+            self.runs.append((text, tags))
+
+    def block_break(self, newlines=2):
+        """End the current block with up to newlines line breaks"""
+        if not self.runs:
+            return
+        trailing = 0
+        for text, _ in reversed(self.runs):
+            stripped = text.rstrip("\n")
+            trailing += len(text) - len(stripped)
+            if stripped:
+                break
+        missing = newlines - trailing
+        if missing > 0:
+            self.emit("\n" * missing)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in MARKDOWN_TAGS:
+            self.handle_starttag(tag, attrs)
+            self.handle_endtag(tag)
+        else:
+            self.emit(self.get_starttag_text())
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in MARKDOWN_TAGS:
+            self.emit(self.get_starttag_text())
+        elif tag in HEADINGS:
+            self.block_break()
+            self.tags.append(HEADINGS[tag])
+        elif tag == "pre":
+            self.block_break()
+            self.pre += 1
+            self.tags.append("pre")
+        elif tag == "code" and self.pre:
+            # Code inside a block is already styled by "pre"
+            self.tags.append(None)
+        elif tag in INLINE:
+            self.tags.append(INLINE[tag])
+            if tag == "a":
+                self.links.append([dict(attrs).get("href") or "", ""])
+        elif tag == "img":
+            self.emit(dict(attrs).get("alt") or "")
+        elif tag in ("ul", "ol"):
+            self.block_break(1 if self.lists else 2)
+            self.lists.append(0 if tag == "ol" else None)
+        elif tag == "li":
+            self.block_break(1)
+            depth = max(len(self.lists) - 1, 0)
+            if self.lists and self.lists[-1] is not None:
+                self.lists[-1] += 1
+                bullet = f"{self.lists[-1]}. "
+            else:
+                bullet = "• "
+            self.emit("    " * depth + bullet)
+        elif tag == "p":
+            self.block_break(1 if self.lists else 2)
+        elif tag == "br":
+            self.emit("\n")
+        elif tag == "hr":
+            self.block_break()
+            self.emit("―" * 12)
+            self.block_break()
+
+    def handle_endtag(self, tag):
+        if tag not in MARKDOWN_TAGS:
+            self.emit(f"</{tag}>")
+        elif tag in HEADINGS or tag == "pre":
+            if self.tags:
+                self.tags.pop()
+            if tag == "pre":
+                self.pre -= 1
+            self.block_break()
+        elif tag in INLINE:
+            if tag == "a" and self.links:
+                href, text = self.links.pop()
+                # Keep the target visible unless the link text already is the target
+                if href and href != text.strip():
+                    self.emit(f" ({href})")
+            if self.tags:
+                self.tags.pop()
+        elif tag in ("ul", "ol"):
+            if self.lists:
+                self.lists.pop()
+            self.block_break(1 if self.lists else 2)
+        elif tag == "p":
+            self.block_break(1 if self.lists else 2)
+
+    def handle_data(self, data):
+        if self.pre:
+            self.emit(data)
+        elif data.strip() or "\n" not in data:
+            # Outside code blocks line breaks are soft, as in rendered HTML; whitespace
+            # between blocks is dropped but a space between inline elements is kept
+            self.emit(" ".join(data.split("\n")))
+
+    def result(self):
+        runs = [(text, tuple(tag for tag in tags if tag)) for text, tags in self.runs]
+        if runs:
+            runs[-1] = (runs[-1][0].rstrip("\n"), runs[-1][1])
+        return [run for run in runs if run[0]]
+
+
+def parse(text):
+    """Parse Markdown text into a list of (text, tag names) runs"""
+    builder = RunBuilder()
+    builder.feed(markdown.markdown(text, extensions=["fenced_code", "sane_lists"]))
+    builder.close()
+    return builder.result()
+
+
+class MarkdownRenderer:
+    """Parses replies off the GTK thread and caches the runs by text hash.
+
+    One renderer is shared by every bot window (see get_markdown_renderer),
+    so dispatch must not be tied to a window.
+    """
+
+    def __init__(self, dispatch, max_entries=RENDER_CACHE_SIZE):
+        self.dispatch = dispatch
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nexus-markdown")
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text):
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def cached(self, text):
+        """Runs for text if they were parsed before, else None"""
+        key = self.key(text)
+        with self.lock:
+            runs = self.cache.get(key)
+            if runs is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+            return runs
+
+    def render(self, text):
+        """Parse text into runs (call from a worker thread)"""
+        runs = self.cached(text)
+        if runs is not None:
+            return runs
+        try:
+            runs = parse(text)
+        except Exception as e:
+            logging.error(f"Markdown rendering failed: {e}")
+            runs = [(text, ())]
+        key = self.key(text)
+        with self.lock:
+            self.misses += 1
+            self.cache[key] = runs
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return runs
+
+    def render_async(self, text, callback):
+        """Parse text on the render thread and hand the runs to callback on the UI thread"""
+        self.executor.submit(lambda: self.dispatch(callback, self.render(text)))
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.cache), 'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_markdown_renderer(dispatch):
+    """Return the process-wide renderer, shared by every bot window"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = MarkdownRenderer(dispatch)
+            atexit.register(_renderer.close)
+        return _renderer
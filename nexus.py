@@ -7,7 +7,21 @@ import threading
 import webbrowser
 import requests
 import logging
+import itertools
+import functools
+from collections import OrderedDict
 from help import HelpDialog
+from gemini_client import get_client, RequestCancelled
+from resilience import CircuitBreaker, CircuitOpenError, RateLimitedError
+from response_cache import get_response_cache, strip_nocache, cache_key
+from similarity import get_similar_prompts
+from singleflight import SingleFlight
+from ai_worker import get_worker
+from conversation import ConversationContext
+from offline_queue import get_offline_queue
+import tracing
+from providers import get_router
+from intents import IntentRouter
 import pytesseract # type: ignore
 from dotenv import load_dotenv # type: ignore
 import subprocess
@@ -16,10 +30,37 @@ from Xlib import display  # For active window detection
 gi.require_version('Gtk', '3.0')
 gi.require_version('AppIndicator3', '0.1')
 gi.require_version('Wnck', '3.0')
-from gi.repository import Gtk, Gdk, GLib, AppIndicator3, Wnck
+from gi.repository import Gtk, Gdk, GLib, Gio, GObject, Pango, AppIndicator3, Wnck
+from chat_store import get_chat_store, MATCH_START, MATCH_END
+from transcript import ChatTranscript
+from ui_queue import UIQueue
+from markdown_render import get_markdown_renderer
+from prompt_history import get_prompt_history
+from clipboard_store import get_clipboard_store
+from paste_engine import PasteEngine
 
 load_dotenv()
 api_key = os.getenv('GEMINI_API_KEY')
+# Stream answers token-by-token unless NEXUS_STREAM=0
+STREAM_ENABLED = os.getenv('NEXUS_STREAM', '1') != '0'
+# Open the Gemini connection when the bot window is shown unless NEXUS_PREWARM=0
+PREWARM_ENABLED = os.getenv('NEXUS_PREWARM', '1') != '0'
+QUEUED_TEXT = "(offline, will be sent when the connection is back)"
+# Newest clipboard entries listed in the menu, and rows loaded per page of the history dialog
+CLIPBOARD_MENU_ITEMS = 20
+HISTORY_DIALOG_ITEMS = 50
+# Menu position of the newest entry, after the header and its separator
+CLIPBOARD_MENU_FIRST = 2
+# Wait for the menu or popup to release its keyboard grab before sending the paste keys
+PASTE_DELAY_MS = int(os.getenv('NEXUS_PASTE_DELAY', '80'))
+
+
+class ClipboardEntry(GObject.Object):
+    """Clipboard store entry wrapped for Gio.ListStore"""
+
+    def __init__(self, entry):
+        super().__init__()
+        self.entry = entry
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -51,8 +92,10 @@ def init_wnck_screen():
         return None
 
 class NexusBot(Gtk.Window):
-    def __init__(self):
+    def __init__(self, controller=None):
         super().__init__(title="Nexus AI Bot")
+        # Tray controller from main.py, used for the update actions
+        self.controller = controller
         self.set_default_size(300, 600)
         
         # Position window on the left side
@@ -62,8 +105,20 @@ class NexusBot(Gtk.Window):
         self.stick()
         self.set_keep_above(True)
 
+        # Request currently being answered and every request still pending
+        self.active_request = None
+        self.pending_requests = set()
+        self.tracer = tracing.Tracer()
+        # Every update from worker threads reaches GTK through this per-frame queue
+        self.ui = UIQueue(self)
+        self.message_ids = itertools.count(1)
+
         # Initialize clipboard
-        self.clipboard_history = []
+        self.clipboard_history = get_clipboard_store()
+        self.paste_engine = PasteEngine()
+        self.clipboard_listener = lambda *event: self.run_on_ui(self.on_clipboard_event, *event)
+        self.clipboard_history.add_listener(self.clipboard_listener)
+        self.connect("destroy", lambda widget: self.clipboard_history.remove_listener(self.clipboard_listener))
         notify2.init("AL Nexus")
 
         # Create a spinner for loading indication
@@ -81,8 +136,37 @@ class NexusBot(Gtk.Window):
 
         # Create UI elements
         self.create_nav_bar()
+        self.create_search_bar()
         self.create_chat_area()
         self.create_input_area()
+        self.create_debug_panel()
+
+        self.client = get_client(api_key)
+        self.router = get_router(api_key)
+        self.intents = IntentRouter()
+        psutil.cpu_percent(interval=None)  # Prime the CPU counter so later reads return at once
+        self.cache = get_response_cache()
+        self.similar_prompts = get_similar_prompts()
+        self.conversation = ConversationContext()
+        self.inflight = SingleFlight("Gemini requests")
+        self.ai = get_worker()
+        self.breaker_listener = lambda state: self.run_on_ui(self.show_api_state, state, key="api-state")
+        self.client.breaker.add_listener(self.breaker_listener)
+        self.connect("destroy", lambda widget: self.client.breaker.remove_listener(self.breaker_listener))
+        if PREWARM_ENABLED:
+            self.connect("map", lambda widget: self.client.prewarm())
+
+        # Prompts sent while offline are replayed when the network comes back
+        self.offline_queue = get_offline_queue()
+        # Replays started by this window; the queue's claims keep windows from sending a prompt twice
+        self.replaying = set()
+        self.replay_stalled = False
+        self.replay_source_id = None
+        self.connect("destroy", lambda widget: self.replay_source_id and GLib.source_remove(self.replay_source_id))
+        self.network_monitor = Gio.NetworkMonitor.get_default()
+        network_handler = self.network_monitor.connect("network-changed", self.on_network_changed)
+        self.connect("destroy", lambda widget: self.network_monitor.disconnect(network_handler))
+        GLib.idle_add(self.restore_offline_queue)
 
         self.show_all()
         self.start_clipboard_monitoring()
@@ -219,6 +303,10 @@ class NexusBot(Gtk.Window):
                 background: #E3E9EF;
                 margin: 4px 0;
             }
+
+            .search-hit textview {
+                background: #FFF8E1;
+            }
         """)
         Gtk.StyleContext.add_provider_for_screen(
             Gdk.Screen.get_default(),
@@ -245,22 +333,107 @@ class NexusBot(Gtk.Window):
         self.clipboard_icon.set_image(Gtk.Image.new_from_icon_name("edit-paste-symbolic", Gtk.IconSize.MENU))
         self.nav_bar.pack_end(self.clipboard_icon)
 
+        # Latency debug panel toggle
+        debug_button = Gtk.ToggleButton()
+        debug_button.set_tooltip_text("Latency Traces")
+        debug_button.set_image(Gtk.Image.new_from_icon_name("utilities-system-monitor-symbolic", Gtk.IconSize.MENU))
+        debug_button.connect("toggled", lambda button: self.debug_revealer.set_reveal_child(button.get_active()))
+        self.nav_bar.pack_end(debug_button)
+
         self.create_clipboard_indicator()
 
+    def create_search_bar(self):
+        """Search-as-you-type over the whole chat history (Ctrl+F)"""
+        search_button = Gtk.ToggleButton()
+        search_button.set_tooltip_text("Search History")
+        search_button.set_image(Gtk.Image.new_from_icon_name("edit-find-symbolic", Gtk.IconSize.MENU))
+        self.nav_bar.pack_start(search_button)
+
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
+        self.search_entry = Gtk.SearchEntry()
+        self.search_entry.set_placeholder_text("Search past conversations...")
+        self.search_entry.connect("search-changed", self.on_search_changed)
+        self.search_entry.connect("activate", lambda entry: self.open_search_result(0))
+        box.pack_start(self.search_entry, False, False, 0)
+
+        self.search_results = Gtk.ListBox()
+        self.search_results.connect("row-activated", lambda listbox, row: self.open_search_result(row.get_index()))
+        results_scroll = Gtk.ScrolledWindow()
+        results_scroll.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        results_scroll.set_max_content_height(220)
+        results_scroll.set_propagate_natural_height(True)
+        results_scroll.add(self.search_results)
+        box.pack_start(results_scroll, False, False, 0)
+
+        self.search_bar = Gtk.SearchBar()
+        self.search_bar.set_show_close_button(True)
+        self.search_bar.add(box)
+        self.search_bar.connect_entry(self.search_entry)
+        search_button.bind_property("active", self.search_bar, "search-mode-enabled",
+                                    GObject.BindingFlags.BIDIRECTIONAL)
+        self.main_box.pack_start(self.search_bar, False, False, 0)
+
+        accel_group = Gtk.AccelGroup()
+        self.add_accel_group(accel_group)
+        key, mod = Gtk.accelerator_parse("<Control>F")
+        accel_group.connect(key, mod, Gtk.AccelFlags.VISIBLE, lambda *x: search_button.set_active(True))
+        key, mod = Gtk.accelerator_parse("<Control><Shift>V")
+        accel_group.connect(key, mod, Gtk.AccelFlags.VISIBLE, lambda *x: self.show_clipboard_search(None))
+
+        self.search_generation = 0
+        self.search_hits = []
+
+    def on_search_changed(self, entry):
+        self.search_generation += 1
+        text = entry.get_text().strip()
+        if not text:
+            self.show_search_results(self.search_generation, [])
+            return
+        # Queries run off the UI thread; only the newest result list is shown
+        threading.Thread(target=self.search_history, args=(text, self.search_generation), daemon=True).start()
+
+    def search_history(self, text, generation):
+        started = time.perf_counter()
+        try:
+            results = self.chat_store.search(text)
+        except Exception as e:
+            logging.error(f"History search failed: {e}")
+            results = []
+        logging.debug(f"History search {text!r}: {len(results)} results in "
+                      f"{(time.perf_counter() - started) * 1000:.1f} ms")
+        self.run_on_ui(self.show_search_results, generation, results, key="search-results")
+
+    def show_search_results(self, generation, results):
+        if generation != self.search_generation:
+            return
+        for row in self.search_results.get_children():
+            row.destroy()
+        self.search_hits = results
+        for message in results:
+            stamp = time.strftime("%d %b %H:%M", time.localtime(message['timestamp']))
+            snippet = GLib.markup_escape_text(" ".join(message['snippet'].split()))
+            snippet = snippet.replace(MATCH_START, "<b>").replace(MATCH_END, "</b>")
+            label = Gtk.Label()
+            label.set_markup(f"<small>{GLib.markup_escape_text(message['sender'])} · {stamp}</small>\n{snippet}")
+            label.set_xalign(0)
+            label.set_line_wrap(True)
+            label.set_margin_start(6)
+            label.set_margin_end(6)
+            self.search_results.add(label)
+        self.search_results.show_all()
+
+    def open_search_result(self, index):
+        if 0 <= index < len(self.search_hits):
+            self.transcript.jump_to(self.search_hits[index]['id'])
+
     def create_chat_area(self):
-        # Chat area
-        chat_scroll = Gtk.ScrolledWindow()
-        chat_scroll.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
-        
-        self.chat_history = Gtk.TextView()
-        self.chat_history.set_wrap_mode(Gtk.WrapMode.WORD_CHAR)
-        self.chat_history.set_editable(False)
-        self.chat_history.set_cursor_visible(False)
-        self.chat_buffer = self.chat_history.get_buffer()
+        # Chat area: only a window of messages is realized, the rest stays in the history store
         self.create_text_tags()
-        
-        chat_scroll.add(self.chat_history)
-        self.main_box.pack_start(chat_scroll, True, True, 0)
+        self.chat_store = get_chat_store()
+        # Shared by every window; rows check they are still shown before taking the runs
+        self.renderer = get_markdown_renderer(GLib.idle_add)
+        self.transcript = ChatTranscript(self.chat_store, self.tag_table, self.renderer)
+        self.main_box.pack_start(self.transcript, True, True, 0)
 
     def create_input_area(self):
         # Input area
@@ -273,16 +446,152 @@ class NexusBot(Gtk.Window):
         self.entry = Gtk.Entry()
         self.entry.set_placeholder_text("Type your message...")
         self.entry.connect("activate", self.on_send_message)
+        self.create_prompt_completion()
         input_box.pack_start(self.entry, True, True, 0)
 
         # Add spinner to the input area
         input_box.pack_start(self.spinner, False, False, 0)
 
+        # Stop button cancels pending answers
+        self.stop_button = Gtk.Button()
+        self.stop_button.set_tooltip_text("Stop")
+        self.stop_button.set_image(Gtk.Image.new_from_icon_name("process-stop-symbolic", Gtk.IconSize.MENU))
+        self.stop_button.set_no_show_all(True)
+        self.stop_button.connect("clicked", self.on_stop_clicked)
+        input_box.pack_start(self.stop_button, False, False, 0)
+
         self.main_box.pack_end(input_box, False, False, 0)
 
+    def create_prompt_completion(self):
+        """Up/Down recall of past prompts and prefix suggestions while typing"""
+        # Shared by every window, so the trie is handed over through the main loop itself
+        self.prompt_history = get_prompt_history(GLib.idle_add)
+        self.recall_index = None
+        self.recall_draft = ""
+        self.recalling = False
+
+        self.suggestions = Gtk.ListStore(str)
+        completion = Gtk.EntryCompletion()
+        completion.set_model(self.suggestions)
+        completion.set_text_column(0)
+        # The trie already matched; show whatever it returned
+        completion.set_match_func(lambda *args: True)
+        completion.set_minimum_key_length(1)
+        self.entry.set_completion(completion)
+
+        # Past prompts are only read once the entry is first used
+        self.entry.connect("focus-in-event", lambda *args: self.prompt_history.load())
+        self.entry.connect("changed", self.on_entry_changed)
+        self.entry.connect("key-press-event", self.on_entry_key_press)
+
+    def on_entry_changed(self, entry):
+        self.suggestions.clear()
+        if self.recalling:
+            return
+        self.recall_index = None
+        for prompt in self.prompt_history.complete(entry.get_text()):
+            self.suggestions.append([prompt])
+
+    def on_entry_key_press(self, entry, event):
+        recent = self.prompt_history.recent
+        if event.keyval == Gdk.KEY_Up and recent:
+            if self.recall_index is None:
+                self.recall_draft = entry.get_text()
+                self.recall_index = len(recent)
+            self.recall_index = max(self.recall_index - 1, 0)
+            self.show_recalled(recent[self.recall_index])
+            return True
+        if event.keyval == Gdk.KEY_Down and self.recall_index is not None:
+            self.recall_index += 1
+            if self.recall_index >= len(recent):
+                self.recall_index = None
+                self.show_recalled(self.recall_draft)
+            else:
+                self.show_recalled(recent[self.recall_index])
+            return True
+        return False
+
+    def show_recalled(self, text):
+        self.recalling = True
+        self.entry.set_text(text)
+        self.entry.set_position(-1)
+        self.recalling = False
+
+    def create_debug_panel(self):
+        """Live latency histogram and per-span percentiles of recent requests"""
+        self.debug_revealer = Gtk.Revealer()
+        panel = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
+        panel.set_margin_start(8)
+        panel.set_margin_end(8)
+
+        self.histogram_area = Gtk.DrawingArea()
+        self.histogram_area.set_size_request(-1, 90)
+        self.histogram_area.connect("draw", self.draw_latency_histogram)
+        panel.pack_start(self.histogram_area, False, False, 0)
+
+        self.trace_summary = Gtk.Label(label="No requests traced yet")
+        self.trace_summary.set_xalign(0)
+        self.trace_summary.get_style_context().add_class("monospace")
+        panel.pack_start(self.trace_summary, False, False, 0)
+
+        export_button = Gtk.Button(label="Export Chrome Trace")
+        export_button.connect("clicked", self.export_traces)
+        panel.pack_start(export_button, False, False, 0)
+
+        self.debug_revealer.add(panel)
+        self.main_box.pack_end(self.debug_revealer, False, False, 0)
+        self.tracer.listeners.append(lambda trace: self.update_debug_panel())
+
+    def update_debug_panel(self):
+        lines = [f"{'span':<10}{'n':>5}{'p50':>9}{'p95':>9}"]
+        for name, (count, p50, p95) in sorted(self.tracer.summary().items()):
+            lines.append(f"{name:<10}{count:>5}{p50:>7.0f}ms{p95:>7.0f}ms")
+        self.trace_summary.set_text("\n".join(lines))
+        self.histogram_area.queue_draw()
+
+    def draw_latency_histogram(self, widget, cr):
+        """Bar chart of end-to-end latency over the trace ring buffer"""
+        width = widget.get_allocated_width()
+        height = widget.get_allocated_height()
+        buckets = self.tracer.histogram()
+        highest = max((count for _, count in buckets), default=0) or 1
+        bar_width = width / len(buckets)
+        cr.set_font_size(9)
+        for index, (bound, count) in enumerate(buckets):
+            bar_height = (height - 14) * count / highest
+            cr.set_source_rgba(0.13, 0.59, 0.95, 0.8)
+            cr.rectangle(index * bar_width + 1, height - 14 - bar_height, bar_width - 2, bar_height)
+            cr.fill()
+            cr.set_source_rgb(0.58, 0.64, 0.72)
+            cr.move_to(index * bar_width + 2, height - 2)
+            if bound == float("inf"):
+                label = ">10s"
+            else:
+                label = f"{bound / 1000:g}s" if bound >= 1000 else f"{bound}"
+            cr.show_text(label)
+        return False
+
+    def export_traces(self, button):
+        dialog = Gtk.FileChooserDialog(
+            title="Export Chrome Trace",
+            parent=self,
+            action=Gtk.FileChooserAction.SAVE,
+            buttons=("Cancel", Gtk.ResponseType.CANCEL, "Save", Gtk.ResponseType.OK)
+        )
+        dialog.set_do_overwrite_confirmation(True)
+        dialog.set_current_name("nexus-trace.json")
+        if dialog.run() == Gtk.ResponseType.OK:
+            try:
+                count = self.tracer.export_chrome(dialog.get_filename())
+                logging.info(f"Exported {count} traces to {dialog.get_filename()}")
+            except OSError as e:
+                logging.error(f"Trace export failed: {e}")
+        dialog.destroy()
+
     def create_text_tags(self):
-        tag_table = self.chat_buffer.get_tag_table()
-        
+        # One tag table shared by every message row
+        tag_table = self.tag_table = Gtk.TextTagTable()
+
         # Message alignment tags
         left_tag = Gtk.TextTag.new("left")
         left_tag.set_property("justification", Gtk.Justification.LEFT)
@@ -321,70 +630,355 @@ class NexusBot(Gtk.Window):
         timestamp_tag.set_property("pixels-above-lines", 4)
         tag_table.add(timestamp_tag)
 
-    def append_message(self, sender, message, alignment="left"):
-        end_iter = self.chat_buffer.get_end_iter()
-        
-        # Add timestamp
-        timestamp = time.strftime("%H:%M")
-        self.chat_buffer.insert_with_tags_by_name(
-            end_iter, 
-            f"{timestamp}\n", 
-            "timestamp"
-        )
-        
-        # Add message with styling
-        tag_name = "user" if sender == "You" else "bot"
-        message_text = f"{sender}: {message}\n\n"
-        
-        # Insert message with both alignment and style tags
-        self.chat_buffer.insert_with_tags_by_name(
-            end_iter,
-            message_text,
-            alignment,
-            tag_name
-        )
-        
-        # Scroll to new message
-        GLib.idle_add(
-            self.chat_history.scroll_to_iter,
-            self.chat_buffer.get_end_iter(),
-            0, False, 0, 0
-        )
+        # Markdown tags applied on top of the bot style
+        for name, scale in (("h1", 1.4), ("h2", 1.2), ("h3", 1.1)):
+            heading_tag = Gtk.TextTag.new(name)
+            heading_tag.set_property("scale", scale)
+            heading_tag.set_property("weight", Pango.Weight.BOLD)
+            tag_table.add(heading_tag)
+
+        bold_tag = Gtk.TextTag.new("bold")
+        bold_tag.set_property("weight", Pango.Weight.BOLD)
+        tag_table.add(bold_tag)
+
+        italic_tag = Gtk.TextTag.new("italic")
+        italic_tag.set_property("style", Pango.Style.ITALIC)
+        tag_table.add(italic_tag)
+
+        code_tag = Gtk.TextTag.new("code")
+        code_tag.set_property("family", "monospace")
+        code_tag.set_property("background", "#EEF2F6")
+        tag_table.add(code_tag)
+
+        pre_tag = Gtk.TextTag.new("pre")
+        pre_tag.set_property("family", "monospace")
+        pre_tag.set_property("paragraph-background", "#EEF2F6")
+        pre_tag.set_property("wrap-mode", Gtk.WrapMode.CHAR)
+        pre_tag.set_property("justification", Gtk.Justification.LEFT)
+        tag_table.add(pre_tag)
+
+        link_tag = Gtk.TextTag.new("link")
+        link_tag.set_property("foreground", "#2196F3")
+        link_tag.set_property("underline", Pango.Underline.SINGLE)
+        tag_table.add(link_tag)
+
+    def append_message(self, sender, message, alignment="left", mark_name=None):
+        """Append a message, optionally named by mark_name so it can be extended later"""
+        return self.transcript.append(sender, message, alignment, mark_name)
+
+    def extend_message(self, mark_name, text):
+        """Append text to a message created with a mark"""
+        self.transcript.extend(mark_name, text)
+        return False
+
+    def close_message(self, mark_name, suffix=""):
+        """Finish a streamed message and save its final text"""
+        self.transcript.close(mark_name, suffix)
+        return False
 
     def on_send_message(self, widget):
         """Handle sending messages"""
         user_input = self.entry.get_text().strip()
         if user_input:
             self.append_message("You", user_input, "right")
+            self.prompt_history.add(user_input)
             self.entry.set_text("")
+            self.recall_index = None
+            if self.handle_local_intent(user_input):
+                return
             self.spinner.start()  # Start the spinner
-            threading.Thread(target=self.process_query, args=(user_input,), daemon=True).start()
+            # A new message cancels the answer that is still streaming, unless it
+            # is the same question and will simply join that request
+            key = cache_key(strip_nocache(user_input)[0], self.router.scope, self.conversation.fingerprint())
+            if self.active_request and not self.inflight.in_flight(key):
+                self.active_request.cancel()
+            trace = self.tracer.start("chat message")
+            request = self.ai.submit(functools.partial(self.process_query, trace=trace), user_input,
+                                     on_done=self.on_request_done, dispatch=self.run_on_ui,
+                                     name="chat message")
+            request.trace = trace
+            self.active_request = request
+            self.pending_requests.add(request)
+            self.stop_button.show()
+
+    def handle_local_intent(self, text):
+        """Answer system questions locally; returns False to fall through to the network"""
+        intent = self.intents.classify(text)
+        if intent == "system":
+            self.show_system_info()
+        elif intent == "window":
+            self.show_window_info()
+        elif intent == "update":
+            self.run_system_update()
+        else:
+            return False
+        return True
 
-    def process_query(self, query):
+    def run_system_update(self):
+        """Start the same update & upgrade as the tray menu"""
+        if self.controller is None:
+            self.append_message("System", "System updates are available from the AL Nexus tray menu.", "left")
+            return
+        self.controller.update_upgd(None)
+        self.append_message("System", "Started system update & upgrade in a terminal.", "left")
+
+    def on_stop_clicked(self, button):
+        """Cancel every pending answer"""
+        for request in list(self.pending_requests):
+            request.cancel()
+
+    def on_request_done(self, request):
+        self.pending_requests.discard(request)
+        if getattr(request, "trace", None) is not None:
+            self.tracer.finish(request.trace)
+        if self.active_request is request:
+            self.active_request = None
+        if not self.pending_requests:
+            self.stop_spinner()
+            self.stop_button.hide()
+        return False
+
+    def queue_offline(self, prompt):
+        """Store a prompt for later and leave a placeholder for its answer"""
+        item_id = self.offline_queue.add(prompt)
+        self.show_queued_placeholder(item_id)
+        return False
+
+    def show_queued_placeholder(self, item_id):
+        message_id = self.append_message("Nexus", QUEUED_TEXT, "left", f"queued-{item_id}")
+        # Written right away so a restart finds it next to its prompt instead of adding another
+        self.chat_store.finish(message_id, QUEUED_TEXT)
+        self.offline_queue.set_message(item_id, message_id)
+
+    def restore_offline_queue(self):
+        """Pick up prompts left in the queue by a previous session.
+
+        Their prompts and placeholders are already in the chat history, so the
+        placeholders are only made live again; a new one is added when the
+        history no longer has it.
+        """
+        for item_id, prompt, message_id in self.offline_queue.pending():
+            if message_id is None or not self.transcript.attach(f"queued-{item_id}", message_id):
+                self.show_queued_placeholder(item_id)
+        self.drain_offline_queue()
+        return False
+
+    def on_network_changed(self, monitor, available):
+        if available:
+            self.replay_stalled = False
+            self.drain_offline_queue()
+
+    def drain_offline_queue(self):
+        """Replay queued prompts, at most REPLAY_CONCURRENCY at a time"""
+        self.replay_source_id = None
+        if not self.network_monitor.get_network_available():
+            return False
+        for item_id, prompt, message_id in self.offline_queue.claim():
+            self.replaying.add(item_id)
+            self.ai.submit(self.replay_queued, item_id, prompt, message_id,
+                           on_done=lambda request, item_id=item_id: self.on_replay_done(item_id),
+                           dispatch=self.run_on_ui,
+                           name="queued prompt")
+        return False
+
+    def replay_queued(self, item_id, prompt, message_id, cancel):
+        """Send one queued prompt and fill in its placeholder"""
+        try:
+            try:
+                response = self.fetch_answer(prompt, cancel) or "No response"
+                self.conversation.add_exchange(prompt, response)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, CircuitOpenError,
+                    RateLimitedError) as e:
+                logging.info(f"Queued prompt {item_id} still cannot be sent: {e}")
+                self.replay_stalled = True
+                return
+            except Exception as e:
+                response = f"Error: {str(e)}"
+            self.offline_queue.remove(item_id)
+            if message_id is not None:
+                # Saved here too, so the answer is kept even if this window closes first
+                self.chat_store.finish(message_id, response)
+            self.renderer.render(response)
+            self.run_on_ui(self.show_replayed, item_id, message_id, response)
+        finally:
+            # Here rather than in on_replay_done, which is dropped once the window is gone
+            self.offline_queue.release(item_id)
+
+    def show_replayed(self, item_id, message_id, response):
+        # The placeholder is only live in windows that showed it; the store already has the answer
+        if not self.transcript.replace(f"queued-{item_id}", response) and message_id is None:
+            self.append_message("Nexus", response, "left")
+
+    def on_replay_done(self, item_id):
+        self.replaying.discard(item_id)
+        if not self.replay_stalled:
+            self.drain_offline_queue()
+        elif not self.replaying and self.replay_source_id is None and len(self.offline_queue):
+            # Still unreachable; try again later instead of spinning
+            self.replay_source_id = GLib.timeout_add_seconds(30, self.drain_offline_queue)
+        return False
+
+    def run_on_ui(self, callback, *args, key=None):
+        """Single point where worker results are handed back to the GTK main loop.
+
+        Updates posted with a key replace a still-pending update with the same key.
+        """
+        trace = tracing.current()
+        if trace is None:
+            self.ui.post(callback, *args, key=key)
+            return
+        queued = time.perf_counter()
+
+        def dispatch():
+            started = time.perf_counter()
+            trace.add_span("dispatch", queued, started)
+            callback(*args)
+            trace.add_span("insert", started)
+
+        self.ui.post(dispatch, key=key)
+
+    def process_query(self, query, cancel=None, trace=None):
         """Process user input and get AI response"""
+        cancel = cancel or threading.Event()
+        if trace is not None:
+            trace.add_span("queue", trace.started)
+        tracing.activate(trace)
+        query, use_cache = strip_nocache(query)
+        model = self.router.scope
+        context = self.conversation.fingerprint()
         try:
-            response = self.query_gemini(query, api_key)
-            GLib.idle_add(self.append_message, "Nexus", response, "left")
+            if use_cache:
+                cached = self.cache.get(query, model, context)
+                if cached is not None:
+                    self.conversation.add_exchange(query, cached)
+                    self.show_answer("Nexus (cached)", cached)
+                    return
+                match = self.similar_prompts.lookup(query, model, context)
+                cached = self.cache.get(match[0], model, context) if match else None
+                if cached is not None:
+                    self.conversation.add_exchange(query, cached)
+                    self.show_answer("Nexus (cached, similar)", cached)
+                    return
+
+            if not self.network_monitor.get_network_available():
+                # Only after the cache, so prompts answered before still work offline
+                self.run_on_ui(self.queue_offline, query)
+                return
+
+            key = cache_key(query, model, context)
+            response, shared = self.inflight.do(key, lambda: self.request_answer(query, model, context, cancel))
+            if shared and not cancel.is_set():
+                if not response:
+                    # The request we joined was stopped, so ask again on our own
+                    response, shared = self.inflight.do(key, lambda: self.request_answer(query, model, context, cancel))
+                if shared and response:
+                    self.show_answer("Nexus", response)
+        except RequestCancelled:
+            pass
+        except requests.exceptions.ConnectionError:
+            self.run_on_ui(self.queue_offline, query)
+        except requests.exceptions.Timeout:
+            self.run_on_ui(self.append_message, "System", "Request timed out. Please try again.", "left")
+        except RateLimitedError as e:
+            self.run_on_ui(self.append_message, "System", f"{str(e)}.", "left")
+        except CircuitOpenError as e:
+            if isinstance(e.cause, requests.exceptions.ConnectionError):
+                # The breaker opened on connection failures: the link is down even
+                # though the network monitor still reports it, so keep the prompt
+                self.run_on_ui(self.queue_offline, query)
+            else:
+                self.run_on_ui(self.append_message, "System", f"Error: {str(e)}", "left")
         except Exception as e:
+            logging.error(f"API Error: {e}")
             error_msg = f"Error: {str(e)}"
-            GLib.idle_add(self.append_message, "System", error_msg, "left")
+            self.run_on_ui(self.append_message, "System", error_msg, "left")
         finally:
-            GLib.idle_add(self.stop_spinner)  # Stop the spinner
+            tracing.activate(None)
+            stats = self.client.connection_stats()
+            logging.info(f"Gemini connections reused {stats['reused']}/{stats['requests']} "
+                         f"({stats['reuse_ratio']:.0%})")
+            logging.info(f"Model providers: {self.router.stats()}")
+            logging.info(self.ui.report())
+
+    def show_answer(self, sender, text):
+        """Parse an answer on this worker thread, then append it to the chat"""
+        self.renderer.render(text)
+        self.run_on_ui(self.append_message, sender, text, "left")
+
+    def request_answer(self, query, model, context, cancel):
+        """Fetch and render one answer from the network, then cache it"""
+        response = self.stream_answer(query, cancel) if STREAM_ENABLED else None
+        if response is None and not cancel.is_set():
+            response = self.fetch_answer(query, cancel)
+            self.show_answer("Nexus", response or "No response")
+        if response:
+            self.conversation.add_exchange(query, response)
+            self.cache.put(query, model, response, context)
+            self.similar_prompts.add(query, model, context)
+        return response
+
+    def stream_answer(self, query, cancel):
+        """Stream the answer into the chat as it arrives.
+
+        Providers are tried in the router's order until one produces text.
+        Returns the complete answer, an empty string when the stream was
+        stopped or interrupted after it started, or None when nothing was
+        received so the caller can fall back to the blocking request.
+        """
+        contents = self.conversation.build_contents(query)
+        mark_name = f"stream-{next(self.message_ids)}"
+        parts = []
+
+        for provider in self.router.route(contents):
+            started = time.monotonic()
+            try:
+                for text in provider.stream(contents, cancel):
+                    if not text:
+                        continue
+                    if not parts:
+                        ttft = time.monotonic() - started
+                        provider.record_latency(ttft)
+                        logging.info(f"{provider.name} time to first token: {ttft * 1000:.0f} ms")
+                        self.run_on_ui(self.append_message, "Nexus", "", "left", mark_name)
+                    parts.append(text)
+                    self.run_on_ui(self.extend_message, mark_name, text)
+            except RequestCancelled:
+                if not parts:
+                    raise
+                self.run_on_ui(self.close_message, mark_name, " [stopped]")
+                return ""
+            except Exception as e:
+                if parts:
+                    logging.error(f"Stream interrupted: {e}")
+                    self.run_on_ui(self.close_message, mark_name, " [interrupted]")
+                    return ""
+                logging.warning(f"Streaming from {provider.name} failed: {e}")
+                provider.record_failure()
+                continue
+            break
+
+        if cancel.is_set():
+            if parts:
+                self.run_on_ui(self.close_message, mark_name, " [stopped]")
+            return ""
+        if parts:
+            answer = "".join(parts)
+            # Parse here so closing the message only applies the cached runs
+            self.renderer.render(answer)
+            self.run_on_ui(self.close_message, mark_name)
+            return answer
+        return None
+
+    def fetch_answer(self, query, cancel=None):
+        """Blocking request through the provider router, raising on failure"""
+        contents = self.conversation.build_contents(query)
+        text, provider = self.router.generate(contents, cancel)
+        return text
 
     def query_gemini(self, query, api_key):
         """Query the Gemini API"""
-        url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
-        headers = {'Content-Type': 'application/json'}
-        data = {"contents": [{"parts": [{"text": query}]}]}
-
         try:
-            response = requests.post(f"{url}?key={api_key}", headers=headers, json=data, timeout=10)
-            response.raise_for_status()
-            result = response.json()
-            
-            candidates = result.get("candidates", [])
-            if candidates:
-                return candidates[0].get("content", {}).get("parts", [{}])[0].get("text", "No response")
+            return self.fetch_answer(query) or "No response"
 
         except requests.exceptions.Timeout:
             return "Request timed out. Please try again."
@@ -399,33 +993,37 @@ class NexusBot(Gtk.Window):
                 ram = psutil.virtual_memory()
                 cpu = psutil.cpu_percent(interval=1)
                 
-                GLib.idle_add(self.ram_label.set_text, f"RAM: {ram.percent}%")
-                GLib.idle_add(self.cpu_label.set_text, f"CPU: {cpu}%")
+                self.run_on_ui(self.ram_label.set_text, f"RAM: {ram.percent}%", key="ram-label")
+                self.run_on_ui(self.cpu_label.set_text, f"CPU: {cpu}%", key="cpu-label")
                 
                 time.sleep(2)
 
         threading.Thread(target=monitor, daemon=True).start()
 
     def start_clipboard_monitoring(self):
-        """Monitor clipboard for changes"""
-        def monitor_clipboard():
-            clipboard = Gtk.Clipboard.get(Gdk.SELECTION_CLIPBOARD)
-            last_text = ""
-            
-            while True:
-                try:
-                    text = clipboard.wait_for_text()
-                    if text and text != last_text and len(text.strip()) > 0:
-                        last_text = text
-                        self.clipboard_history.append(text)
-                        if len(self.clipboard_history) > 20:  # Keep last 20 items
-                            self.clipboard_history.pop(0)
-                        GLib.idle_add(self.update_clipboard_menu)
-                except Exception as e:
-                    logging.error(f"Clipboard monitoring error: {e}")
-                time.sleep(0.5)
-
-        threading.Thread(target=monitor_clipboard, daemon=True).start()
+        """Track clipboard changes from the owner-change signal.
+
+        GTK gets selection owner changes from XFixes on the main loop, so
+        nothing runs while the clipboard is idle and no copy is missed.
+        """
+        self.clipboard = Gtk.Clipboard.get(Gdk.SELECTION_CLIPBOARD)
+        self.last_clipboard_text = ""
+        handler = self.clipboard.connect("owner-change", self.on_clipboard_owner_change)
+        self.connect("destroy", lambda widget: self.clipboard.disconnect(handler))
+        # Pick up whatever was copied before the window opened
+        self.clipboard.request_text(self.on_clipboard_text, time.perf_counter())
+
+    def on_clipboard_owner_change(self, clipboard, event):
+        # Asynchronous, so a slow clipboard owner never blocks the main loop
+        clipboard.request_text(self.on_clipboard_text, time.perf_counter())
+
+    def on_clipboard_text(self, clipboard, text, requested):
+        if not text or not text.strip() or text == self.last_clipboard_text:
+            return
+        self.last_clipboard_text = text
+        # The store's listener updates the menu
+        self.clipboard_history.add(text)
+        logging.debug(f"Clipboard captured in {(time.perf_counter() - requested) * 1000:.1f} ms")
 
     def paste_clipped_data(self, widget):
         """ Pastes the last clipped data where the cursor is """
@@ -438,7 +1036,7 @@ class NexusBot(Gtk.Window):
         text = Gtk.Clipboard.get(Gdk.SELECTION_CLIPBOARD).wait_for_text()
         if text:
             cleaned_text = self.simulate_ai_cleaning(text)
-            GLib.idle_add(self.append_message, "AI Cleaned", cleaned_text, "left")
+            self.run_on_ui(self.append_message, "AI Cleaned", cleaned_text, "left")
 
     def simulate_ai_cleaning(self, text):
         """ Simulates AI cleaning of text """
@@ -468,43 +1066,153 @@ class NexusBot(Gtk.Window):
         scrolled = Gtk.ScrolledWindow()
         scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
         
+        # Rows are only created for the pages loaded so far
+        model = Gio.ListStore.new(ClipboardEntry)
         history_box = Gtk.ListBox()
         history_box.set_selection_mode(Gtk.SelectionMode.NONE)
-        
-        for item in reversed(self.clipboard_history):
-            row = Gtk.ListBoxRow()
-            row_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
-            row_box.set_margin_top(6)
-            row_box.set_margin_bottom(6)
-            row_box.set_margin_start(8)
-            row_box.set_margin_end(8)
-            
-            text = Gtk.Label(label=item)
-            text.set_line_wrap(True)
-            text.set_xalign(0)
-            row_box.pack_start(text, True, True, 0)
-            
-            copy_button = Gtk.Button.new_from_icon_name(
-                "edit-copy-symbolic",
-                Gtk.IconSize.BUTTON
-            )
-            copy_button.connect("clicked", lambda btn, txt=item: 
-                Gtk.Clipboard.get(Gdk.SELECTION_CLIPBOARD).set_text(txt, -1))
-            row_box.pack_end(copy_button, False, False, 0)
-            
-            row.add(row_box)
-            history_box.add(row)
+        history_box.bind_model(model, self.create_history_row)
+
+        def load_page():
+            last = model.get_n_items()
+            before = model.get_item(last - 1).entry['seq'] if last else None
+            entries = self.clipboard_history.page(before, HISTORY_DIALOG_ITEMS)
+            model.splice(last, 0, [ClipboardEntry(entry) for entry in entries])
+
+        def on_event(event, *args):
+            if event == "cleared":
+                model.remove_all()
+            elif event == "added":
+                entry = args[0]
+                if args[1]:
+                    self.remove_history_entry(model, entry['sha'])
+                model.insert(0, ClipboardEntry(entry))
+
+        listener = lambda *event: self.run_on_ui(on_event, *event)
+        self.clipboard_history.add_listener(listener)
+        scrolled.connect("edge-reached", lambda window, position:
+                         load_page() if position == Gtk.PositionType.BOTTOM else None)
+        load_page()
         
         scrolled.add(history_box)
         content_area.pack_start(scrolled, True, True, 0)
         content_area.show_all()
         
         response = dialog.run()
+        self.clipboard_history.remove_listener(listener)
         if response == Gtk.ResponseType.REJECT:
             self.clipboard_history.clear()
         
         dialog.destroy()
 
+    def create_history_row(self, item):
+        entry = item.entry
+        row_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        row_box.set_margin_top(6)
+        row_box.set_margin_bottom(6)
+        row_box.set_margin_start(8)
+        row_box.set_margin_end(8)
+        
+        # Precomputed one-line preview; a huge copy never reaches a label
+        text = Gtk.Label(label=entry['preview'])
+        text.set_ellipsize(Pango.EllipsizeMode.END)
+        text.set_xalign(0)
+        row_box.pack_start(text, True, True, 0)
+        
+        copy_button = Gtk.Button.new_from_icon_name(
+            "edit-copy-symbolic",
+            Gtk.IconSize.BUTTON
+        )
+        copy_button.connect("clicked", lambda btn, sha=entry['sha']: self.copy_clipboard_entry(sha))
+        row_box.pack_end(copy_button, False, False, 0)
+        row_box.show_all()
+        return row_box
+
+    def show_clipboard_search(self, widget):
+        """Search-as-you-type popup over the whole clipboard history"""
+        popup = Gtk.Window(title="Search Clipboard")
+        popup.set_transient_for(self)
+        popup.set_type_hint(Gdk.WindowTypeHint.DIALOG)
+        popup.set_position(Gtk.WindowPosition.CENTER_ON_PARENT)
+        popup.set_default_size(420, 320)
+        popup.get_style_context().add_class('clipboard-dialog')
+
+        box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=8)
+        box.set_margin_top(12)
+        box.set_margin_bottom(12)
+        box.set_margin_start(12)
+        box.set_margin_end(12)
+        entry = Gtk.SearchEntry()
+        entry.set_placeholder_text("Type to search copied text...")
+        box.pack_start(entry, False, False, 0)
+
+        results = Gtk.ListBox()
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        scrolled.add(results)
+        box.pack_start(scrolled, True, True, 0)
+        popup.add(box)
+
+        state = {'generation': 0, 'hits': []}
+
+        def show_results(generation, hits):
+            if generation != state['generation']:
+                return
+            state['hits'] = hits
+            for row in results.get_children():
+                row.destroy()
+            for hit in hits:
+                label = Gtk.Label(label=hit['preview'])
+                label.set_ellipsize(Pango.EllipsizeMode.END)
+                label.set_xalign(0)
+                label.set_margin_top(4)
+                label.set_margin_bottom(4)
+                results.add(label)
+            results.show_all()
+
+        def search(text, generation):
+            started = time.perf_counter()
+            try:
+                hits = self.clipboard_history.search(text)
+            except Exception as e:
+                logging.error(f"Clipboard search failed: {e}")
+                hits = []
+            logging.debug(f"Clipboard search {text!r}: {len(hits)} results in "
+                          f"{(time.perf_counter() - started) * 1000:.1f} ms")
+            self.run_on_ui(show_results, generation, hits, key="clipboard-search")
+
+        def on_changed(entry):
+            state['generation'] += 1
+            text = entry.get_text().strip()
+            if not text:
+                show_results(state['generation'], [])
+                return
+            threading.Thread(target=search, args=(text, state['generation']), daemon=True).start()
+
+        def paste(index):
+            if 0 <= index < len(state['hits']):
+                sha = state['hits'][index]['sha']
+                # Close first so the paste goes to the window that had focus
+                popup.destroy()
+                self.paste_clipboard_entry(sha)
+
+        entry.connect("search-changed", on_changed)
+        entry.connect("activate", lambda entry: paste(0))
+        entry.connect("stop-search", lambda entry: popup.destroy())
+        results.connect("row-activated", lambda listbox, row: paste(row.get_index()))
+        popup.show_all()
+        entry.grab_focus()
+
+    def remove_history_entry(self, model, sha):
+        for index in range(model.get_n_items()):
+            if model.get_item(index).entry['sha'] == sha:
+                model.remove(index)
+                return
+
+    def copy_clipboard_entry(self, sha):
+        text = self.clipboard_history.text(sha)
+        if text is not None:
+            Gtk.Clipboard.get(Gdk.SELECTION_CLIPBOARD).set_text(text, -1)
+
     def on_workspace_changed(self, window, pspec):
         """ Detects when the workspace changes """
         self.append_message("System", "Detected workspace change!", "left")
@@ -515,19 +1223,10 @@ class NexusBot(Gtk.Window):
         clipboard.set_text("", -1)
 
     def show_typing_indicator(self):
-        end_iter = self.chat_buffer.get_end_iter()
-        self.typing_mark = self.chat_buffer.create_mark("typing", end_iter, True)
-        self.chat_buffer.insert_with_tags_by_name(
-            end_iter,
-            "Nexus is typing...\n",
-            "timestamp"
-        )
+        self.append_message("Nexus", "typing...", "left", "typing")
         
     def remove_typing_indicator(self):
-        if hasattr(self, 'typing_mark'):
-            start_iter = self.chat_buffer.get_iter_at_mark(self.typing_mark)
-            end_iter = self.chat_buffer.get_end_iter()
-            self.chat_buffer.delete(start_iter, end_iter)
+        self.transcript.remove("typing")
 
     def clear_chat(self, button):
         dialog = Gtk.MessageDialog(
@@ -540,7 +1239,8 @@ class NexusBot(Gtk.Window):
         dialog.format_secondary_text("This action cannot be undone.")
         response = dialog.run()
         if response == Gtk.ResponseType.YES:
-            self.chat_buffer.set_text("")
+            self.transcript.clear()
+            self.conversation.clear()
         dialog.destroy()
 
     def create_clipboard_indicator(self):
@@ -565,7 +1265,7 @@ class NexusBot(Gtk.Window):
         self.update_clipboard_menu()
 
     def update_clipboard_menu(self):
-        """Update the clipboard menu items"""
+        """Rebuild the clipboard menu; later copies patch it in on_clipboard_event"""
         # Clear existing items
         for item in self.clipboard_menu.get_children():
             self.clipboard_menu.remove(item)
@@ -576,22 +1276,26 @@ class NexusBot(Gtk.Window):
         self.clipboard_menu.append(header)
         self.clipboard_menu.append(Gtk.SeparatorMenuItem())
         
-        # Add clipboard items
-        for text in reversed(self.clipboard_history):
-            # Create menu item
-            display_text = (text[:50] + "...") if len(text) > 50 else text
-            item = Gtk.MenuItem(label=display_text)
-            item.connect('activate', lambda x, t=text: self.paste_clipboard_item(None, t))
-            self.clipboard_menu.append(item)
+        # Add clipboard items, oldest first in the map so the tail is cheap to drop
+        self.clipboard_items = OrderedDict()
+        for entry in reversed(self.clipboard_history.recent(CLIPBOARD_MENU_ITEMS)):
+            self.clipboard_items[entry['sha']] = item = self.create_clipboard_item(entry)
+            self.clipboard_menu.insert(item, CLIPBOARD_MENU_FIRST)
         
-        if not self.clipboard_history:
-            empty_item = Gtk.MenuItem(label="(Empty)")
-            empty_item.set_sensitive(False)
-            self.clipboard_menu.append(empty_item)
+        self.clipboard_empty_item = Gtk.MenuItem(label="(Empty)")
+        self.clipboard_empty_item.set_sensitive(False)
+        self.clipboard_empty_item.set_no_show_all(True)
+        self.clipboard_empty_item.set_visible(not self.clipboard_items)
+        self.clipboard_menu.append(self.clipboard_empty_item)
         
         # Add separator and management options
         self.clipboard_menu.append(Gtk.SeparatorMenuItem())
         
+        # Add search option
+        search_item = Gtk.MenuItem(label="Search...")
+        search_item.connect('activate', self.show_clipboard_search)
+        self.clipboard_menu.append(search_item)
+        
         # Add preferences option
         prefs_item = Gtk.MenuItem(label="Preferences")
         prefs_item.connect('activate', self.show_clipboard_preferences)
@@ -604,23 +1308,59 @@ class NexusBot(Gtk.Window):
         
         self.clipboard_menu.show_all()
 
+    def create_clipboard_item(self, entry):
+        # The full text is only read when the item is pasted
+        item = Gtk.MenuItem(label=entry['preview'])
+        item.connect('activate', lambda x, sha=entry['sha']: self.paste_clipboard_entry(sha))
+        item.show()
+        return item
+
+    def on_clipboard_event(self, event, *args):
+        """Patch the clipboard menu for one change of the clipboard store"""
+        if event == "cleared":
+            self.update_clipboard_menu()
+        elif event == "added":
+            entry, moved = args
+            item = self.clipboard_items.pop(entry['sha'], None)
+            if item is None:
+                item = self.create_clipboard_item(entry)
+                self.clipboard_menu.insert(item, CLIPBOARD_MENU_FIRST)
+            else:
+                self.clipboard_menu.reorder_child(item, CLIPBOARD_MENU_FIRST)
+            self.clipboard_items[entry['sha']] = item
+            if len(self.clipboard_items) > CLIPBOARD_MENU_ITEMS:
+                self.clipboard_items.popitem(last=False)[1].destroy()
+            self.clipboard_empty_item.hide()
+        elif event == "removed":
+            item = self.clipboard_items.pop(args[0], None)
+            if item is not None:
+                # Only when the history shrank below the menu size; refill from the store
+                self.update_clipboard_menu()
+
+    def paste_clipboard_entry(self, sha):
+        text = self.clipboard_history.text(sha)
+        if text is not None:
+            self.paste_clipboard_item(None, text)
+
     def paste_clipboard_item(self, menuitem, text):
         """Paste the selected clipboard item"""
         try:
-            # Set clipboard content
-            clipboard = Gtk.Clipboard.get(Gdk.SELECTION_CLIPBOARD)
-            clipboard.set_text(text, -1)
-            clipboard.store()
-            
-            # Use xdotool to simulate typing instead of Ctrl+V
-            subprocess.run([
-                'xdotool', 'type', '--delay', '50', text
-            ], check=True)
-            
+            # Set clipboard content; PRIMARY too, which some terminals paste on Shift+Insert
+            for selection in (Gdk.SELECTION_CLIPBOARD, Gdk.SELECTION_PRIMARY):
+                clipboard = Gtk.Clipboard.get(selection)
+                clipboard.set_text(text, -1)
+            Gtk.Clipboard.get(Gdk.SELECTION_CLIPBOARD).store()
+            GLib.timeout_add(PASTE_DELAY_MS, self.send_paste, text)
         except Exception as e:
             logging.error(f"Paste failed: {e}")
             self.show_paste_error()
 
+    def send_paste(self, text):
+        # Runs on the main loop, which must stay free to hand the selection to the target window
+        if is_wayland() or not self.paste_engine.paste():
+            self.paste_engine.type_text(text, on_error=lambda: self.run_on_ui(self.show_paste_error))
+        return False
+
     def show_paste_error(self):
         """Show error dialog when paste fails"""
         dialog = Gtk.MessageDialog(
@@ -666,7 +1406,6 @@ class NexusBot(Gtk.Window):
         response = dialog.run()
         if response == Gtk.ResponseType.YES:
             self.clipboard_history.clear()
-            self.update_clipboard_menu()
         dialog.destroy()
 
     def show_clipboard_preferences(self, widget):
@@ -689,8 +1428,8 @@ class NexusBot(Gtk.Window):
         # History size
         history_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
         history_label = Gtk.Label(label="Maximum History Size:")
-        history_spin = Gtk.SpinButton.new_with_range(5, 50, 5)
-        history_spin.set_value(len(self.clipboard_history) if self.clipboard_history else 20)
+        history_spin = Gtk.SpinButton.new_with_range(10, 100000, 10)
+        history_spin.set_value(self.clipboard_history.max_entries)
         history_box.pack_start(history_label, False, False, 0)
         history_box.pack_end(history_spin, False, False, 0)
         box.pack_start(history_box, False, False, 0)
@@ -709,9 +1448,7 @@ class NexusBot(Gtk.Window):
         
         if response == Gtk.ResponseType.OK:
             # Save the new history size
-            new_size = int(history_spin.get_value())
-            while len(self.clipboard_history) > new_size:
-                self.clipboard_history.pop(0)
+            self.clipboard_history.set_max_entries(int(history_spin.get_value()))
             
             # Update the menu
             self.update_clipboard_menu()
@@ -860,7 +1597,7 @@ class NexusBot(Gtk.Window):
     def show_system_info(self):
         """Show system information"""
         ram = psutil.virtual_memory()
-        cpu = psutil.cpu_percent(interval=1)
+        cpu = psutil.cpu_percent(interval=None)
         disk = psutil.disk_usage('/')
         
         info = (
@@ -924,6 +1661,15 @@ class NexusBot(Gtk.Window):
         help_dialog = HelpDialog()
         help_dialog.show_all()
 
+    def show_api_state(self, state):
+        """Show the Gemini circuit breaker state in the header bar"""
+        subtitles = {
+            CircuitBreaker.OPEN: "API unavailable",
+            CircuitBreaker.HALF_OPEN: "API recovering"
+        }
+        self.nav_bar.set_subtitle(subtitles.get(state, ""))
+        return False
+
     def stop_spinner(self):
         """Stop the loading spinner"""
         self.spinner.stop()
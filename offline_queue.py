@@ -0,0 +1,104 @@
+import os
+import time
+import atexit
+import sqlite3
+import threading
+
+QUEUE_PATH = os.path.expanduser('~/.local/share/nexusctl/offline_queue.db')
+REPLAY_CONCURRENCY = int(os.getenv('NEXUS_REPLAY_CONCURRENCY', '2'))
+
+
+class OfflineQueue:
+    """Durable queue of prompts that could not be sent while offline.
+
+    One queue is shared by every bot window (see get_offline_queue); a
+    prompt is claimed before it is replayed, so two windows never send the
+    same one.
+    """
+
+    def __init__(self, path=QUEUE_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS pending (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                prompt TEXT NOT NULL,
+                created REAL NOT NULL,
+                message_id INTEGER
+            )
+        """)
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(pending)")]
+        if "message_id" not in columns:
+            self.db.execute("ALTER TABLE pending ADD COLUMN message_id INTEGER")
+        self.db.commit()
+        self.replaying = set()
+
+    def add(self, prompt):
+        """Store a prompt and return its queue id"""
+        with self.lock:
+            cursor = self.db.execute(
+                "INSERT INTO pending (prompt, created) VALUES (?, ?)", (prompt, time.time())
+            )
+            self.db.commit()
+            return cursor.lastrowid
+
+    def pending(self):
+        """All queued (id, prompt, placeholder message id) rows, oldest first"""
+        with self.lock:
+            return self.db.execute("SELECT id, prompt, message_id FROM pending ORDER BY id").fetchall()
+
+    def claim(self, limit=REPLAY_CONCURRENCY):
+        """Mark up to limit more queued rows as replaying and return them.
+
+        At most limit rows are replaying at once across all callers.
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT id, prompt, message_id FROM pending ORDER BY id").fetchall()
+            claimed = []
+            for row in rows:
+                if len(self.replaying) >= limit:
+                    break
+                if row[0] not in self.replaying:
+                    self.replaying.add(row[0])
+                    claimed.append(row)
+            return claimed
+
+    def release(self, item_id):
+        """End a replay, whether or not the prompt was answered"""
+        with self.lock:
+            self.replaying.discard(item_id)
+
+    def set_message(self, item_id, message_id):
+        """Remember the chat message that shows the placeholder for a queued prompt"""
+        with self.lock:
+            self.db.execute("UPDATE pending SET message_id = ? WHERE id = ?", (message_id, item_id))
+            self.db.commit()
+
+    def remove(self, item_id):
+        with self.lock:
+            self.db.execute("DELETE FROM pending WHERE id = ?", (item_id,))
+            self.db.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_offline_queue():
+    """Return the process-wide offline queue, shared by every bot window"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = OfflineQueue()
+            atexit.register(_queue.close)
+        return _queue
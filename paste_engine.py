@@ -0,0 +1,101 @@
+import os
+import time
+import logging
+import subprocess
+import threading
+from Xlib import X, XK, display, error
+from Xlib.ext import xtest
+
+# Window classes that paste with Shift+Insert instead of Ctrl+V
+TERMINALS = {
+    "gnome-terminal", "gnome-terminal-server", "xterm", "uxterm", "urxvt", "rxvt", "konsole",
+    "xfce4-terminal", "mate-terminal", "lxterminal", "qterminal", "terminator", "tilix",
+    "alacritty", "kitty", "st", "st-256color", "terminology", "wezterm", "foot", "guake",
+    "tilda", "yakuake", "sakura", "kgx", "ptyxis",
+} | {name.strip().lower() for name in os.getenv('NEXUS_PASTE_TERMINALS', '').split(',') if name.strip()}
+# Characters per xdotool process when typing is the only option
+TYPE_CHUNK = int(os.getenv('NEXUS_PASTE_TYPE_CHUNK', '256'))
+TYPE_DELAY_MS = int(os.getenv('NEXUS_PASTE_TYPE_DELAY', '2'))
+
+
+class PasteEngine:
+    """Pastes by sending one paste shortcut through XTest.
+
+    The caller puts the text on the clipboard first; the engine only presses
+    Ctrl+V, or Shift+Insert when the focused window is a terminal, so the
+    cost does not depend on the length of the text. One X connection is
+    opened on first use and kept, and reopened if the server drops it.
+    Typing the text with xdotool is kept as a fallback for when XTest is
+    missing.
+    """
+
+    def __init__(self):
+        self.display = None
+        self.available = None
+
+    def connect(self):
+        if self.display is None:
+            self.display = display.Display()
+            self.available = self.display.has_extension('XTEST')
+            if not self.available:
+                logging.warning("X server has no XTEST extension, paste will type the text instead")
+        return self.display
+
+    def keycode(self, name):
+        return self.display.keysym_to_keycode(XK.string_to_keysym(name))
+
+    def focused_class(self):
+        """Lower-cased WM_CLASS of the focused top-level window, or None"""
+        window = self.display.get_input_focus().focus
+        root = self.display.screen().root
+        # Focus is often on a child window; WM_CLASS is set on the top-level one
+        while isinstance(window, type(root)) and window != root:
+            wmclass = window.get_wm_class()
+            if wmclass:
+                return wmclass[-1].lower()
+            window = window.query_tree().parent
+        return None
+
+    def shortcut(self, wmclass):
+        if wmclass is not None and (wmclass in TERMINALS or wmclass.endswith("term")):
+            return ("Shift_L", "Insert")
+        return ("Control_L", "v")
+
+    def paste(self):
+        """Send the paste shortcut to the focused window; False if XTest cannot be used"""
+        started = time.perf_counter()
+        try:
+            self.connect()
+            if not self.available:
+                return False
+            wmclass = self.focused_class()
+            modifier, key = (self.keycode(name) for name in self.shortcut(wmclass))
+            xtest.fake_input(self.display, X.KeyPress, modifier)
+            xtest.fake_input(self.display, X.KeyPress, key)
+            xtest.fake_input(self.display, X.KeyRelease, key)
+            xtest.fake_input(self.display, X.KeyRelease, modifier)
+            self.display.sync()
+        except (error.DisplayError, error.ConnectionClosedError, error.XError, OSError) as e:
+            logging.error(f"XTest paste failed: {e}")
+            self.display = None
+            return False
+        logging.debug(f"Pasted into {wmclass or 'unknown window'} in "
+                      f"{(time.perf_counter() - started) * 1000:.1f} ms")
+        return True
+
+    def type_text(self, text, on_error=None):
+        """Type text with xdotool on a background thread, a chunk per process"""
+        def run():
+            try:
+                for start in range(0, len(text), TYPE_CHUNK):
+                    # Through stdin so text starting with "-" is not read as an option
+                    subprocess.run(
+                        ['xdotool', 'type', '--delay', str(TYPE_DELAY_MS), '--file', '-'],
+                        input=text[start:start + TYPE_CHUNK].encode("utf-8"), check=True
+                    )
+            except (OSError, subprocess.CalledProcessError) as e:
+                logging.error(f"Typing paste failed: {e}")
+                if on_error is not None:
+                    on_error()
+
+        threading.Thread(target=run, name="nexus-paste-type", daemon=True).start()
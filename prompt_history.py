@@ -0,0 +1,255 @@
+import os
+import math
+import time
+import queue
+import atexit
+import logging
+import sqlite3
+import threading
+
+HISTORY_PATH = os.path.expanduser('~/.local/share/nexusctl/prompt_history.db')
+# Prompts offered per keystroke and kept for Up/Down recall
+SUGGESTIONS = int(os.getenv('NEXUS_PROMPT_SUGGESTIONS', '5'))
+RECALL_SIZE = int(os.getenv('NEXUS_PROMPT_RECALL', '1000'))
+# A use counts half as much after this many seconds
+HALF_LIFE = float(os.getenv('NEXUS_PROMPT_HALF_LIFE', str(7 * 24 * 3600)))
+EPOCH = 1704067200  # 2024-01-01, keeps the exponents small
+
+
+def frecency(score, used_at):
+    """Add one use at used_at to a log2-scaled frecency score.
+
+    A use is worth 2 ** (age / HALF_LIFE) relative to EPOCH, so newer uses
+    weigh more and a score never has to be recomputed as time passes.
+    """
+    weight = (used_at - EPOCH) / HALF_LIFE
+    if score is None:
+        return weight
+    high, low = max(score, weight), min(score, weight)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+class Node:
+    __slots__ = ("label", "children", "top")
+
+    def __init__(self, label="", children=None, top=None):
+        self.label = label
+        self.children = children or {}
+        # Ids of the best prompts below this node, best first
+        self.top = top or []
+
+
+class PromptTrie:
+    """Radix trie of prompts; every node caches its best SUGGESTIONS completions.
+
+    Lookups only walk the typed prefix, so their cost does not depend on the
+    number of prompts. Scores only ever grow, so updating the cached lists on
+    the inserted path keeps every node correct.
+    """
+
+    def __init__(self, size=SUGGESTIONS):
+        self.size = size
+        self.root = Node()
+        self.prompts = []
+        self.ids = {}
+        self.scores = []
+
+    def __len__(self):
+        return len(self.prompts)
+
+    def add(self, prompt, score):
+        """Insert prompt or raise its score"""
+        key = prompt.lower()
+        prompt_id = self.ids.get(key)
+        if prompt_id is None:
+            prompt_id = self.ids[key] = len(self.prompts)
+            self.prompts.append(prompt)
+            self.scores.append(score)
+        else:
+            self.prompts[prompt_id] = prompt
+            self.scores[prompt_id] = max(score, self.scores[prompt_id])
+
+        node = self.root
+        self.promote(node, prompt_id)
+        rest = key
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None:
+                child = node.children[rest[0]] = Node(rest)
+                self.promote(child, prompt_id)
+                return
+            common = os.path.commonprefix([child.label, rest])
+            if common != child.label:
+                # Split the edge; the new node covers exactly the old child's prompts
+                split = Node(common, {child.label[len(common)]: child}, list(child.top))
+                child.label = child.label[len(common):]
+                node.children[rest[0]] = split
+                child = split
+            self.promote(child, prompt_id)
+            node = child
+            rest = rest[len(common):]
+
+    def promote(self, node, prompt_id):
+        top = node.top
+        if prompt_id in top:
+            top.remove(prompt_id)
+        score = self.scores[prompt_id]
+        index = 0
+        while index < len(top) and self.scores[top[index]] >= score:
+            index += 1
+        if index < self.size:
+            top.insert(index, prompt_id)
+            del top[self.size:]
+
+    def complete(self, prefix, limit=SUGGESTIONS):
+        """Best stored prompts starting with prefix (case-insensitive)"""
+        node = self.root
+        rest = prefix.lower()
+        while rest:
+            child = node.children.get(rest[0])
+            if child is None:
+                return []
+            if rest.startswith(child.label):
+                rest = rest[len(child.label):]
+            elif child.label.startswith(rest):
+                rest = ""
+            else:
+                return []
+            node = child
+        return [self.prompts[i] for i in node.top[:limit]]
+
+
+class PromptHistory:
+    """Past prompts for Up/Down recall and autocomplete.
+
+    Nothing is read until load() is called; the trie is then built on a
+    background thread and handed over through dispatch. Each new prompt is
+    saved on its own as an upsert by a writer thread. One history is shared
+    by every bot window (see get_prompt_history), so dispatch must not be
+    tied to a window.
+    """
+
+    def __init__(self, dispatch, path=HISTORY_PATH):
+        self.dispatch = dispatch
+        self.path = path
+        self.trie = None
+        self.recent = []
+        self.loading = False
+        self.early = []
+        self.writes = queue.Queue()
+        self.thread = threading.Thread(target=self.write_loop, name="nexus-prompt-history", daemon=True)
+        self.thread.start()
+
+    def connect(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        db = sqlite3.connect(self.path)
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS prompts (
+                prompt TEXT PRIMARY KEY,
+                score REAL NOT NULL,
+                uses INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        db.execute("CREATE INDEX IF NOT EXISTS prompts_last_used ON prompts (last_used)")
+        return db
+
+    def load(self):
+        """Start building the trie in the background, once"""
+        if self.trie is not None or self.loading:
+            return
+        self.loading = True
+        threading.Thread(target=self.build, daemon=True).start()
+
+    def build(self):
+        started = time.perf_counter()
+        trie = PromptTrie()
+        recent = []
+        try:
+            db = self.connect()
+            for prompt, score in db.execute("SELECT prompt, score FROM prompts"):
+                trie.add(prompt, score)
+            recent = [row[0] for row in db.execute(
+                "SELECT prompt FROM prompts ORDER BY last_used DESC LIMIT ?", (RECALL_SIZE,)
+            )]
+            recent.reverse()
+            db.close()
+        except sqlite3.Error as e:
+            logging.error(f"Loading prompt history failed: {e}")
+        logging.info(f"Loaded {len(trie)} past prompts in {(time.perf_counter() - started) * 1000:.0f} ms")
+        self.dispatch(self.on_built, trie, recent)
+
+    def on_built(self, trie, recent):
+        self.trie = trie
+        self.recent = recent
+        self.loading = False
+        # Prompts sent while the trie was being built
+        for prompt, used_at in self.early:
+            self.remember(prompt, used_at)
+        self.early = []
+
+    def add(self, prompt, used_at=None):
+        """Record a sent prompt (call on the UI thread)"""
+        used_at = time.time() if used_at is None else used_at
+        self.writes.put((prompt, used_at))
+        if self.trie is None:
+            self.early.append((prompt, used_at))
+        else:
+            self.remember(prompt, used_at)
+
+    def remember(self, prompt, used_at):
+        prompt_id = self.trie.ids.get(prompt.lower())
+        score = None if prompt_id is None else self.trie.scores[prompt_id]
+        self.trie.add(prompt, frecency(score, used_at))
+        if prompt in self.recent:
+            self.recent.remove(prompt)
+        self.recent.append(prompt)
+        del self.recent[:-RECALL_SIZE]
+
+    def complete(self, prefix, limit=SUGGESTIONS):
+        if self.trie is None or not prefix:
+            return []
+        typed = prefix.lower()
+        return [prompt for prompt in self.trie.complete(prefix, limit + 1) if prompt.lower() != typed][:limit]
+
+    def write_loop(self):
+        db = None
+        while True:
+            item = self.writes.get()
+            if item is None:
+                if db is not None:
+                    db.close()
+                return
+            prompt, used_at = item
+            try:
+                db = db or self.connect()
+                row = db.execute("SELECT score FROM prompts WHERE prompt = ?", (prompt,)).fetchone()
+                score = frecency(row[0] if row else None, used_at)
+                db.execute(
+                    "INSERT INTO prompts (prompt, score, uses, last_used) VALUES (?, ?, 1, ?) "
+                    "ON CONFLICT(prompt) DO UPDATE SET score = excluded.score, uses = uses + 1, "
+                    "last_used = excluded.last_used",
+                    (prompt, score, used_at)
+                )
+                db.commit()
+            except sqlite3.Error as e:
+                logging.error(f"Saving prompt history failed: {e}")
+
+    def close(self):
+        """Write the prompts still queued and stop the writer"""
+        self.writes.put(None)
+        self.thread.join()
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_prompt_history(dispatch):
+    """Return the process-wide prompt history, shared by every bot window"""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = PromptHistory(dispatch)
+            atexit.register(_history.close)
+        return _history
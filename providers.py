@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import logging
+import threading
+import requests
+import tracing
+from gemini_client import get_client, extract_text, TracingAdapter, RequestCancelled
+from resilience import CircuitBreaker, CircuitOpenError
+from conversation import estimate_tokens
+
+# Optional local model server: NEXUS_LOCAL_PROVIDER=ollama or openai
+LOCAL_PROVIDER = os.getenv('NEXUS_LOCAL_PROVIDER', '').lower()
+LOCAL_URL = os.getenv('NEXUS_LOCAL_URL', '')
+LOCAL_MODEL = os.getenv('NEXUS_LOCAL_MODEL', 'llama3.2')
+LOCAL_MAX_TOKENS = int(os.getenv('NEXUS_LOCAL_MAX_TOKENS', '512'))
+LATENCY_ALPHA = 0.3
+# A failed call counts as a very slow one so routing moves away from it
+FAILURE_PENALTY = 10.0
+
+
+def to_messages(contents):
+    """Convert Gemini contents into OpenAI/Ollama chat messages"""
+    messages = []
+    for content in contents:
+        role = "assistant" if content.get("role") == "model" else "user"
+        text = "".join(part.get("text", "") for part in content.get("parts", []))
+        messages.append({"role": role, "content": text})
+    return messages
+
+
+class Provider:
+    """A chat model endpoint with its own health and latency record"""
+
+    local = False
+    max_prompt_tokens = None
+
+    def __init__(self, name, model):
+        self.name = name
+        self.model = model
+        self.breaker = CircuitBreaker()
+        self.latency = None
+        self.lock = threading.Lock()
+
+    def record_latency(self, seconds):
+        with self.lock:
+            if self.latency is None:
+                self.latency = seconds
+            else:
+                self.latency = LATENCY_ALPHA * seconds + (1 - LATENCY_ALPHA) * self.latency
+
+    def record_failure(self):
+        self.record_latency(FAILURE_PENALTY)
+
+    @property
+    def healthy(self):
+        return self.breaker.state != CircuitBreaker.OPEN
+
+    def generate(self, contents, cancel=None):
+        """Return the full answer text"""
+        raise NotImplementedError
+
+    def stream(self, contents, cancel=None):
+        """Yield answer text as it arrives"""
+        raise NotImplementedError
+
+
+class GeminiProvider(Provider):
+    def __init__(self, client):
+        super().__init__("gemini", client.model)
+        self.client = client
+        # The client's own breaker already tracks Gemini health
+        self.breaker = client.breaker
+
+    def generate(self, contents, cancel=None):
+        return extract_text(self.client.generate(contents, cancel))
+
+    def stream(self, contents, cancel=None):
+        for chunk in self.client.stream(contents, cancel):
+            yield extract_text(chunk)
+
+
+class LocalProvider(Provider):
+    """Base for model servers running on this machine"""
+
+    local = True
+    max_prompt_tokens = LOCAL_MAX_TOKENS
+
+    def __init__(self, name, base_url, model):
+        super().__init__(name, model)
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        self.session.mount('http://', TracingAdapter(pool_maxsize=4, max_retries=0))
+        self.session.mount('https://', TracingAdapter(pool_maxsize=4, max_retries=0))
+
+    def post(self, path, payload, stream):
+        self.breaker.before_request()
+        started = time.perf_counter()
+        try:
+            response = self.session.post(f"{self.base_url}{path}", json=payload,
+                                         stream=stream, timeout=(2, 60))
+            tracing.add_span("ttfb", started)
+        except Exception as e:
+            self.breaker.record_failure(e)
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        response.raise_for_status()
+        return response
+
+
+class OllamaProvider(LocalProvider):
+    def __init__(self, base_url, model):
+        super().__init__("ollama", base_url or "http://localhost:11434", model)
+
+    def generate(self, contents, cancel=None):
+        payload = {"model": self.model, "messages": to_messages(contents), "stream": False}
+        response = self.post("/api/chat", payload, stream=False)
+        return response.json().get("message", {}).get("content", "")
+
+    def stream(self, contents, cancel=None):
+        payload = {"model": self.model, "messages": to_messages(contents), "stream": True}
+        with self.post("/api/chat", payload, stream=True) as response:
+            for line in response.iter_lines():
+                if cancel is not None and cancel.is_set():
+                    return
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                yield chunk.get("message", {}).get("content", "")
+                if chunk.get("done"):
+                    return
+
+
+class OpenAICompatibleProvider(LocalProvider):
+    def __init__(self, base_url, model):
+        super().__init__("openai", base_url or "http://localhost:8080", model)
+
+    def generate(self, contents, cancel=None):
+        payload = {"model": self.model, "messages": to_messages(contents)}
+        response = self.post("/v1/chat/completions", payload, stream=False)
+        choices = response.json().get("choices", [])
+        return choices[0].get("message", {}).get("content", "") if choices else ""
+
+    def stream(self, contents, cancel=None):
+        payload = {"model": self.model, "messages": to_messages(contents), "stream": True}
+        with self.post("/v1/chat/completions", payload, stream=True) as response:
+            # SSE is always UTF-8, whatever requests guesses from the content type
+            response.encoding = 'utf-8'
+            for line in response.iter_lines(decode_unicode=True):
+                if cancel is not None and cancel.is_set():
+                    return
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    return
+                choices = json.loads(data).get("choices", [])
+                if choices:
+                    yield choices[0].get("delta", {}).get("content") or ""
+
+
+class ProviderRouter:
+    """Orders providers by health, prompt size and measured latency.
+
+    Providers without a latency sample yet are tried first so every one gets
+    measured; local providers are skipped for prompts over their token limit.
+    """
+
+    def __init__(self, providers):
+        self.providers = providers
+        self.scope = "+".join(f"{p.name}:{p.model}" for p in providers)
+
+    def route(self, contents):
+        """Providers to try for this request, best first"""
+        prompt_tokens = sum(
+            estimate_tokens(part.get("text", "")) for content in contents for part in content.get("parts", [])
+        )
+        candidates = [
+            p for p in self.providers
+            if p.max_prompt_tokens is None or prompt_tokens <= p.max_prompt_tokens
+        ]
+        healthy = [p for p in candidates if p.healthy]
+        ordered = sorted(healthy, key=lambda p: (p.latency is not None, p.latency or 0.0))
+        # Unhealthy providers are kept as a last resort behind the healthy ones
+        ordered += [p for p in candidates if not p.healthy]
+        return ordered or list(self.providers)
+
+    def generate(self, contents, cancel=None):
+        """Return (answer, provider), falling back to the next provider on failure"""
+        error = None
+        for provider in self.route(contents):
+            started = time.monotonic()
+            try:
+                text = provider.generate(contents, cancel)
+            except RequestCancelled:
+                raise
+            except Exception as e:
+                logging.warning(f"Provider {provider.name} failed: {e}")
+                provider.record_failure()
+                error = error or e
+                continue
+            provider.record_latency(time.monotonic() - started)
+            return text, provider
+        raise error or CircuitOpenError("No model provider available")
+
+    def stats(self):
+        return {
+            p.name: {'model': p.model, 'latency_ms': None if p.latency is None else round(p.latency * 1000),
+                     'state': p.breaker.state}
+            for p in self.providers
+        }
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router(api_key):
+    """Return the process-wide router: Gemini plus the configured local server, if any"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            providers = [GeminiProvider(get_client(api_key))]
+            if LOCAL_PROVIDER == "ollama":
+                providers.append(OllamaProvider(LOCAL_URL, LOCAL_MODEL))
+            elif LOCAL_PROVIDER in ("openai", "openai-compatible"):
+                providers.append(OpenAICompatibleProvider(LOCAL_URL, LOCAL_MODEL))
+            _router = ProviderRouter(providers)
+        return _router
@@ -0,0 +1,185 @@
+import os
+import math
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+RATE_LIMIT = float(os.getenv('NEXUS_RATE_LIMIT', '2.0'))
+RATE_BURST = int(os.getenv('NEXUS_RATE_BURST', '5'))
+MAX_RETRIES = int(os.getenv('NEXUS_MAX_RETRIES', '3'))
+BREAKER_THRESHOLD = int(os.getenv('NEXUS_BREAKER_THRESHOLD', '5'))
+BREAKER_RESET = float(os.getenv('NEXUS_BREAKER_RESET', '30'))
+# Longest the client waits for the rate limit; a longer Retry-After fails at once
+MAX_RETRY_AFTER = float(os.getenv('NEXUS_MAX_RETRY_AFTER', '15'))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint that is known to be unhealthy.
+
+    cause is the error behind the failure that opened the breaker, if known.
+    """
+
+    def __init__(self, message, cause=None):
+        super().__init__(message)
+        self.cause = cause
+
+
+class RateLimitedError(Exception):
+    """Raised when the API asks for a longer pause than the client will wait"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Gemini API is rate limited, retry in {math.ceil(retry_after)} s")
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    """Return the Retry-After header value in seconds, or None"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=0.5, cap=8.0):
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """Client-side rate limiter that slows down when the server pushes back.
+
+    A 429 halves the refill rate and blocks until Retry-After has passed;
+    every success nudges the rate back up towards the configured maximum.
+    """
+
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_BURST):
+        self.max_rate = rate
+        self.min_rate = rate / 16
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, cancel=None, timeout=MAX_RETRY_AFTER):
+        """Wait for a token; returns False when cancelled or timed out"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            if now + wait > deadline:
+                return False
+            if cancel is not None:
+                if cancel.wait(min(wait, 0.25)):
+                    return False
+            else:
+                time.sleep(min(wait, 0.25))
+
+    def blocked_for(self):
+        """Seconds until a token can be handed out again"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            return max(self.blocked_until - now, (1 - self.tokens) / self.rate, 0.0)
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+    def on_throttled(self, retry_after=None):
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        logging.warning(f"Gemini throttled; rate lowered to {self.rate:.2f}/s"
+                        + (f", pausing {retry_after:.1f}s" if retry_after else ""))
+
+
+class CircuitBreaker:
+    """Fails fast after repeated failures, then lets one trial request through"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_timeout=BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.last_error = None
+        self.listeners = []
+        self.lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """callback(state) is called from the requesting thread on every state change"""
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def _set_state(self, state):
+        if state == self.state:
+            return
+        self.state = state
+        logging.info(f"Gemini circuit breaker {state}")
+        for callback in self.listeners:
+            try:
+                callback(state)
+            except Exception as e:
+                logging.error(f"Circuit breaker listener failed: {e}")
+
+    def before_request(self):
+        with self.lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError("Gemini API is unavailable, retrying later", self.last_error)
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self.trial_running:
+                    raise CircuitOpenError("Gemini API is recovering, retrying later", self.last_error)
+                self.trial_running = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.trial_running = False
+            self._set_state(self.CLOSED)
+
+    def record_failure(self, error=None):
+        with self.lock:
+            self.failures += 1
+            self.last_error = error
+            self.trial_running = False
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def release(self):
+        """End a trial that was neither a success nor an endpoint failure"""
+        with self.lock:
+            self.trial_running = False
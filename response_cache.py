@@ -0,0 +1,171 @@
+import os
+import re
+import time
+import atexit
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+CACHE_PATH = os.path.expanduser('~/.local/share/nexusctl/response_cache.db')
+CACHE_TTL = int(os.getenv('NEXUS_CACHE_TTL', str(24 * 3600)))
+CACHE_MAX_BYTES = int(os.getenv('NEXUS_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))
+MEMORY_MAX_BYTES = int(os.getenv('NEXUS_CACHE_MEMORY_BYTES', str(1024 * 1024)))
+NOCACHE_PREFIX = "/nocache"
+
+
+def normalize_prompt(prompt):
+    """Lowercase and collapse whitespace so trivially different prompts share a key"""
+    return re.sub(r"\s+", " ", prompt.strip().lower()).rstrip("?!. ")
+
+
+def strip_nocache(prompt):
+    """Return the prompt without a leading /nocache and whether the cache may be used"""
+    stripped = prompt.strip()
+    if stripped.lower().startswith(NOCACHE_PREFIX):
+        return stripped[len(NOCACHE_PREFIX):].strip(), False
+    return prompt, True
+
+
+def cache_key(prompt, model, context=""):
+    raw = "\x00".join((model, context, normalize_prompt(prompt)))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier answer cache: in-memory LRU in front of an SQLite file, both with TTL"""
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES,
+                 memory_max_bytes=MEMORY_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory_max_bytes = memory_max_bytes
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.db.commit()
+
+    def get(self, prompt, model, context=""):
+        """Return the cached answer or None when missing or expired"""
+        key = cache_key(prompt, model, context)
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                response, expires = entry
+                if expires > now:
+                    self.memory.move_to_end(key)
+                    self.hits += 1
+                    return response
+                self._drop_memory(key)
+
+            row = self.db.execute(
+                "SELECT response, expires FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.db.commit()
+                self.misses += 1
+                return None
+
+            self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.db.commit()
+            self._remember(key, row[0], row[1])
+            self.hits += 1
+            return row[0]
+
+    def put(self, prompt, model, response, context="", ttl=None):
+        """Store an answer in both tiers"""
+        if not response:
+            return
+        key = cache_key(prompt, model, context)
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else ttl)
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            self._remember(key, response, expires)
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, expires, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, expires, now)
+            )
+            self._evict_disk(now)
+            self.db.commit()
+
+    def _remember(self, key, response, expires):
+        self._drop_memory(key)
+        size = len(response.encode("utf-8"))
+        if size > self.memory_max_bytes:
+            return
+        self.memory[key] = (response, expires)
+        self.memory_bytes += size
+        while self.memory_bytes > self.memory_max_bytes:
+            self._drop_memory(next(iter(self.memory)))
+
+    def _drop_memory(self, key):
+        entry = self.memory.pop(key, None)
+        if entry is not None:
+            self.memory_bytes -= len(entry[0].encode("utf-8"))
+
+    def _evict_disk(self, now):
+        self.db.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used rows until the byte cap holds again
+        for key, size in self.db.execute(
+            "SELECT key, size FROM responses ORDER BY accessed ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._drop_memory(key)
+            total -= size
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'memory_entries': len(self.memory),
+                'memory_bytes': self.memory_bytes
+            }
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide answer cache, shared by every bot window"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+            atexit.register(_cache.close)
+        return _cache
@@ -0,0 +1,187 @@
+import os
+import re
+import time
+import atexit
+import sqlite3
+import hashlib
+import logging
+import threading
+
+SIMILARITY_PATH = os.path.expanduser('~/.local/share/nexusctl/similarity.db')
+SIMILARITY_THRESHOLD = float(os.getenv('NEXUS_SIMILARITY_THRESHOLD', '0.9'))
+SIMILARITY_MAX_ENTRIES = int(os.getenv('NEXUS_SIMILARITY_MAX_ENTRIES', '5000'))
+
+FINGERPRINT_BITS = 64
+BANDS = 4
+BAND_BITS = FINGERPRINT_BITS // BANDS
+
+# Filler words that change the wording but not the question; negations are kept on purpose
+STOP_WORDS = {
+    "a", "an", "the", "i", "me", "my", "we", "our", "you", "your", "it", "its",
+    "do", "does", "did", "can", "could", "would", "should", "please", "how", "to",
+    "up", "of", "for", "on", "in", "is", "are", "am", "be", "some", "any", "just",
+    "tell", "show", "give", "want", "need", "way", "ways", "what", "whats", "s"
+}
+
+
+def content_tokens(prompt):
+    """Lowercase words of a prompt without filler words and simple plural/verb endings"""
+    tokens = []
+    for word in re.findall(r"[a-z0-9_\-\.\/]+", prompt.lower()):
+        word = word.strip(".-")
+        if not word or word in STOP_WORDS:
+            continue
+        for suffix in ("ing", "es", "s"):
+            if len(word) > len(suffix) + 3 and word.endswith(suffix):
+                word = word[:-len(suffix)]
+                break
+        tokens.append(word)
+    return tokens
+
+
+def simhash(tokens):
+    """64-bit SimHash over single tokens and adjacent pairs"""
+    features = list(tokens) + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    weights = [0] * FINGERPRINT_BITS
+    for feature in features:
+        digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if digest >> bit & 1 else -1
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def bands(fingerprint):
+    mask = (1 << BAND_BITS) - 1
+    return [(band, fingerprint >> (band * BAND_BITS) & mask) for band in range(BANDS)]
+
+
+class SimilarPromptIndex:
+    """SimHash index with LSH banding for reusing answers to reworded prompts.
+
+    A candidate has to share at least one band with the query, be within the
+    Hamming threshold and also pass a token Jaccard check, so prompts that only
+    look alike bit-wise do not get each other's answers.
+    """
+
+    def __init__(self, path=SIMILARITY_PATH, threshold=SIMILARITY_THRESHOLD,
+                 max_entries=SIMILARITY_MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.entries = {}
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS prompts (
+                scope TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                added REAL NOT NULL,
+                PRIMARY KEY (scope, prompt)
+            )
+        """)
+        self.db.commit()
+        for scope, prompt, fingerprint in self.db.execute(
+            "SELECT scope, prompt, fingerprint FROM prompts ORDER BY added DESC LIMIT ?", (max_entries,)
+        ):
+            self._index(scope, prompt, int(fingerprint, 16), content_tokens(prompt))
+
+    def _index(self, scope, prompt, fingerprint, tokens):
+        key = (scope, prompt)
+        self.entries[key] = (fingerprint, frozenset(tokens))
+        for band in bands(fingerprint):
+            self.buckets.setdefault((scope,) + band, set()).add(prompt)
+
+    def _unindex(self, scope, prompt):
+        fingerprint, _ = self.entries.pop((scope, prompt))
+        for band in bands(fingerprint):
+            bucket = self.buckets.get((scope,) + band)
+            if bucket is not None:
+                bucket.discard(prompt)
+                if not bucket:
+                    del self.buckets[(scope,) + band]
+
+    def add(self, prompt, model, context=""):
+        """Remember a prompt whose answer is in the response cache"""
+        tokens = content_tokens(prompt)
+        if not tokens:
+            return
+        scope = f"{model}\x00{context}"
+        fingerprint = simhash(tokens)
+        with self.lock:
+            if (scope, prompt) in self.entries:
+                self._unindex(scope, prompt)
+            self._index(scope, prompt, fingerprint, tokens)
+            self.db.execute(
+                "INSERT OR REPLACE INTO prompts (scope, prompt, fingerprint, added) VALUES (?, ?, ?, ?)",
+                (scope, prompt, f"{fingerprint:016x}", time.time())
+            )
+            if len(self.entries) > self.max_entries:
+                for old_scope, old_prompt in self.db.execute(
+                    "SELECT scope, prompt FROM prompts ORDER BY added ASC LIMIT ?",
+                    (len(self.entries) - self.max_entries,)
+                ).fetchall():
+                    if (old_scope, old_prompt) in self.entries:
+                        self._unindex(old_scope, old_prompt)
+                    self.db.execute("DELETE FROM prompts WHERE scope = ? AND prompt = ?", (old_scope, old_prompt))
+            self.db.commit()
+
+    def lookup(self, prompt, model, context=""):
+        """Return (stored_prompt, similarity) of the closest match above the threshold, or None"""
+        tokens = content_tokens(prompt)
+        scope = f"{model}\x00{context}"
+        best = None
+        if tokens:
+            fingerprint = simhash(tokens)
+            token_set = frozenset(tokens)
+            with self.lock:
+                candidates = set()
+                for band in bands(fingerprint):
+                    candidates |= self.buckets.get((scope,) + band, set())
+                for candidate in candidates:
+                    other_fingerprint, other_tokens = self.entries[(scope, candidate)]
+                    similarity = 1 - bin(fingerprint ^ other_fingerprint).count("1") / FINGERPRINT_BITS
+                    overlap = len(token_set & other_tokens) / len(token_set | other_tokens)
+                    score = min(similarity, overlap)
+                    if score >= self.threshold and (best is None or score > best[1]):
+                        best = (candidate, score)
+
+        with self.lock:
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        logging.info(f"Similar prompt lookup {'hit' if best else 'miss'}; {self.report()}")
+        return best
+
+    def report(self):
+        lookups = self.hits + self.misses
+        ratio = self.hits / lookups if lookups else 0.0
+        return f"similar-prompt hits {self.hits}, misses {self.misses} ({ratio:.0%})"
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_similar_prompts():
+    """Return the process-wide similar-prompt index, loaded once and shared by every bot window"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SimilarPromptIndex()
+            atexit.register(_index.close)
+        return _index
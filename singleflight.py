@@ -0,0 +1,62 @@
+import logging
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run only one call per key at a time and hand its result to every concurrent caller"""
+
+    def __init__(self, name="requests"):
+        self.name = name
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.executed = 0
+        self.saved = 0
+
+    def do(self, key, fn):
+        """Return (result, shared); shared is True when another caller did the work"""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self.calls[key] = call
+                self.executed += 1
+            else:
+                self.saved += 1
+
+        if not leader:
+            logging.info(f"Coalesced duplicate {self.name}; {self.report()}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self, key):
+        with self.lock:
+            return key in self.calls
+
+    def stats(self):
+        with self.lock:
+            return {'executed': self.executed, 'saved': self.saved, 'in_flight': len(self.calls)}
+
+    def report(self):
+        stats = self.stats()
+        return f"{self.name} executed {stats['executed']}, saved {stats['saved']}, in flight {stats['in_flight']}"
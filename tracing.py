@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import itertools
+import threading
+from collections import deque
+
+TRACE_BUFFER = int(os.getenv('NEXUS_TRACE_BUFFER', '500'))
+HISTOGRAM_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf")]
+
+_current = threading.local()
+_trace_ids = itertools.count(1)
+
+
+def current():
+    """Trace active on this thread, or None"""
+    return getattr(_current, "trace", None)
+
+
+def activate(trace):
+    """Make trace the active trace of this thread (None clears it)"""
+    _current.trace = trace
+
+
+def add_span(name, started, ended=None):
+    """Add a span to the active trace, if there is one"""
+    trace = current()
+    if trace is not None:
+        trace.add_span(name, started, ended)
+
+
+class Span:
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.trace is not None:
+            self.trace.add_span(self.name, self.started)
+        return False
+
+
+def span(name):
+    """Context manager timing a span on the active trace"""
+    return Span(current(), name)
+
+
+class Trace:
+    """Timed spans of one request, from keypress to rendered text"""
+
+    def __init__(self, name):
+        self.id = next(_trace_ids)
+        self.name = name
+        self.started = time.perf_counter()
+        self.ended = None
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def add_span(self, name, started, ended=None):
+        ended = time.perf_counter() if ended is None else ended
+        with self.lock:
+            self.spans.append((name, started, ended, threading.get_ident()))
+
+    def finish(self):
+        self.ended = time.perf_counter()
+
+    @property
+    def duration(self):
+        return (self.ended or time.perf_counter()) - self.started
+
+    def span_totals(self):
+        """Total seconds per span name"""
+        totals = {}
+        with self.lock:
+            for name, started, ended, _ in self.spans:
+                totals[name] = totals.get(name, 0.0) + (ended - started)
+        return totals
+
+
+class Tracer:
+    """Ring buffer of finished traces with histogram and Chrome trace export"""
+
+    def __init__(self, size=TRACE_BUFFER):
+        self.traces = deque(maxlen=size)
+        self.lock = threading.Lock()
+        self.listeners = []
+
+    def start(self, name):
+        return Trace(name)
+
+    def finish(self, trace):
+        trace.finish()
+        with self.lock:
+            self.traces.append(trace)
+        for callback in self.listeners:
+            callback(trace)
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.traces)
+
+    def histogram(self, span_name=None):
+        """(bucket upper bound in ms, count) pairs for total latency or one span"""
+        counts = [0] * len(HISTOGRAM_BUCKETS_MS)
+        for trace in self.snapshot():
+            if span_name is None:
+                seconds = trace.duration
+            else:
+                seconds = trace.span_totals().get(span_name)
+                if seconds is None:
+                    continue
+            for index, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+                if seconds * 1000 <= bound:
+                    counts[index] += 1
+                    break
+        return list(zip(HISTOGRAM_BUCKETS_MS, counts))
+
+    def summary(self):
+        """{span name: (count, p50 ms, p95 ms)} over the buffered traces"""
+        samples = {}
+        for trace in self.snapshot():
+            samples.setdefault("total", []).append(trace.duration)
+            for name, seconds in trace.span_totals().items():
+                samples.setdefault(name, []).append(seconds)
+        result = {}
+        for name, values in samples.items():
+            values.sort()
+            pick = lambda p: values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))] * 1000
+            result[name] = (len(values), pick(50), pick(95))
+        return result
+
+    def export_chrome(self, path):
+        """Write the buffered traces as Chrome trace event JSON (chrome://tracing, Perfetto)"""
+        traces = self.snapshot()
+        origin = min((trace.started for trace in traces), default=0.0)
+        events = []
+        for trace in traces:
+            events.append({
+                "name": trace.name, "cat": "request", "ph": "X", "pid": 1, "tid": trace.id,
+                "ts": (trace.started - origin) * 1e6, "dur": trace.duration * 1e6,
+                "args": {"trace": trace.id}
+            })
+            with trace.lock:
+                spans = list(trace.spans)
+            for name, started, ended, thread_id in spans:
+                events.append({
+                    "name": name, "cat": "span", "ph": "X", "pid": 1, "tid": trace.id,
+                    "ts": (started - origin) * 1e6, "dur": (ended - started) * 1e6,
+                    "args": {"thread": thread_id}
+                })
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(traces)
@@ -0,0 +1,324 @@
+import os
+import time
+import logging
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gtk, GLib
+
+# Most message rows kept as widgets, and how many are loaded per scroll page
+WINDOW_SIZE = int(os.getenv('NEXUS_TRANSCRIPT_WINDOW', '150'))
+PAGE_SIZE = int(os.getenv('NEXUS_TRANSCRIPT_PAGE', '50'))
+# Characters of rendered Markdown inserted per main loop iteration
+RENDER_CHUNK = int(os.getenv('NEXUS_RENDER_CHUNK', '4000'))
+
+
+class MessageRow(Gtk.ListBoxRow):
+    """One message, rendered in its own small TextView over a shared tag table"""
+
+    def __init__(self, message, tag_table):
+        super().__init__()
+        self.message_id = message['id']
+        self.sender = message['sender']
+        self.timestamp = message['timestamp']
+        self.alignment = message['alignment']
+        self.style = "user" if message['sender'] == "You" else "bot"
+        self.tag_table = tag_table
+        self.text = ""
+        self.generation = 0
+        self.set_selectable(False)
+        self.set_activatable(False)
+
+        self.buffer, self.body_start = self.new_buffer()
+        self.view = Gtk.TextView.new_with_buffer(self.buffer)
+        self.view.set_wrap_mode(Gtk.WrapMode.WORD_CHAR)
+        self.view.set_editable(False)
+        self.view.set_cursor_visible(False)
+        self.add(self.view)
+        self.extend(message['text'])
+        self.show_all()
+
+    def new_buffer(self):
+        """A buffer holding the timestamp and sender, and a mark where the body starts"""
+        buffer = Gtk.TextBuffer.new(self.tag_table)
+        stamp = time.strftime("%H:%M", time.localtime(self.timestamp))
+        buffer.insert_with_tags_by_name(buffer.get_end_iter(), f"{stamp}\n", "timestamp")
+        buffer.insert_with_tags_by_name(buffer.get_end_iter(), f"{self.sender}: ", self.alignment, self.style)
+        # Left-gravity mark so the body can be replaced
+        return buffer, buffer.create_mark(None, buffer.get_end_iter(), True)
+
+    def extend(self, text):
+        self.text += text
+        self.buffer.insert_with_tags_by_name(self.buffer.get_end_iter(), text, self.alignment, self.style)
+
+    def set_body(self, text):
+        self.generation += 1
+        self.text = ""
+        self.buffer.delete(self.buffer.get_iter_at_mark(self.body_start), self.buffer.get_end_iter())
+        self.extend(text)
+
+    def apply_runs(self, runs, text):
+        """Show precomputed Markdown runs for text.
+
+        The runs go into a fresh buffer a chunk at a time from idle callbacks,
+        so a very long answer never blocks the main loop; the view switches to
+        the new buffer once it is complete.
+        """
+        if text != self.text or self.get_parent() is None:
+            return
+        self.generation += 1
+        generation = self.generation
+        buffer, body_start = self.new_buffer()
+        pieces = ((run_text[i:i + RENDER_CHUNK], tags)
+                  for run_text, tags in runs for i in range(0, len(run_text), RENDER_CHUNK))
+
+        def step():
+            if generation != self.generation or self.get_parent() is None:
+                return False
+            budget = RENDER_CHUNK
+            for piece, tags in pieces:
+                buffer.insert_with_tags_by_name(buffer.get_end_iter(), piece, self.alignment, self.style, *tags)
+                budget -= len(piece)
+                if budget <= 0:
+                    return True
+            self.buffer, self.body_start = buffer, body_start
+            self.view.set_buffer(buffer)
+            return False
+
+        if step():
+            GLib.idle_add(step)
+
+
+class ChatTranscript(Gtk.ScrolledWindow):
+    """Chat transcript that only keeps a window of rows alive.
+
+    Messages live in a ChatStore; at most WINDOW_SIZE of them are realized as
+    rows. Scrolling to either edge loads the next page from the store and
+    evicts rows from the opposite end, so memory and layout cost stay flat no
+    matter how long the session runs. Messages being streamed ("live") are
+    addressed by a key and keep their current text here until closed, so
+    their rows can be evicted and recreated like any other. Finished bot
+    replies are shown as Markdown once the renderer has parsed them.
+    """
+
+    def __init__(self, store, tag_table, renderer=None, window=WINDOW_SIZE, page=PAGE_SIZE):
+        super().__init__()
+        self.store = store
+        self.tag_table = tag_table
+        self.renderer = renderer
+        self.window = max(window, page * 2)
+        self.page = page
+        self.rows = []
+        self.live = {}
+        self.latest_id = 0
+        self.stick = True
+        self.anchor = None
+        self.adjusting = False
+        self.evicted = 0
+
+        self.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        self.list = Gtk.ListBox()
+        self.list.set_selection_mode(Gtk.SelectionMode.NONE)
+        self.add(self.list)
+
+        self.connect("edge-reached", self.on_edge_reached)
+        self.get_vadjustment().connect("value-changed", self.on_scrolled)
+        # Runs after the rows have their new allocation, so scroll fixes see the final layout
+        self.list.connect_after("size-allocate", self.on_list_allocated)
+
+        messages = self.store.last_page(self.page)
+        if messages:
+            self.latest_id = messages[-1]['id']
+        self.insert_rows(messages, len(self.rows))
+
+    def make_row(self, message):
+        live = next((m for m in self.live.values() if m['id'] == message['id']), None)
+        return MessageRow(live or message, self.tag_table), live is None
+
+    def render(self, row):
+        """Replace a bot reply's plain text with its Markdown runs"""
+        if self.renderer is None or not row.sender.startswith("Nexus"):
+            return
+        text = row.text
+        runs = self.renderer.cached(text)
+        if runs is not None:
+            row.apply_runs(runs, text)
+        else:
+            self.renderer.render_async(text, lambda runs: row.apply_runs(runs, text))
+
+    def insert_rows(self, messages, position):
+        for offset, message in enumerate(messages):
+            row, finished = self.make_row(message)
+            self.list.insert(row, position + offset)
+            self.rows.insert(position + offset, row)
+            if finished:
+                self.render(row)
+
+    def find_row(self, message_id):
+        # Rows are in id order and streamed messages are near the end
+        for row in reversed(self.rows):
+            if row.message_id == message_id:
+                return row
+        return None
+
+    def evict(self, count, from_top):
+        for _ in range(max(0, count)):
+            row = self.rows.pop(0 if from_top else -1)
+            row.destroy()
+            self.evicted += 1
+
+    @property
+    def has_newer(self):
+        return bool(self.rows) and self.rows[-1].message_id < self.latest_id
+
+    def append(self, sender, text, alignment="left", key=None):
+        """Store and show a message and return its id; key names a live message for extend/close/replace"""
+        # Read before latest_id moves to the new message, which no row shows yet
+        behind = self.has_newer
+        message = self.store.append(sender, text, alignment, live=bool(key))
+        self.latest_id = message['id']
+        if key:
+            self.live[key] = message
+        if behind:
+            # Scrolled back in history: jump to the newest page like a chat client does
+            self.jump_to_latest()
+        else:
+            self.insert_rows([message], len(self.rows))
+        self.stick = True
+        if len(self.rows) > self.window:
+            self.evict(len(self.rows) - self.window, from_top=True)
+        self.list.queue_resize()
+        return message['id']
+
+    def attach(self, key, message_id):
+        """Make a stored message live again under key; False if it is gone"""
+        messages = self.store.page_after(message_id - 1, 1)
+        if not messages or messages[0]['id'] != message_id:
+            return False
+        self.live[key] = messages[0]
+        return True
+
+    def jump_to_latest(self):
+        self.evict(len(self.rows), from_top=True)
+        self.insert_rows(self.store.last_page(self.page), 0)
+
+    def jump_to(self, message_id):
+        """Show the page around message_id, scroll it to the top and flash it"""
+        half = self.page // 2
+        messages = self.store.page_before(message_id, half) + self.store.page_after(message_id - 1, half + 1)
+        if not any(message['id'] == message_id for message in messages):
+            return False
+        self.evict(len(self.rows), from_top=True)
+        self.insert_rows(messages, 0)
+        self.stick = False
+        row = self.find_row(message_id)
+        self.anchor = (row, 0)
+        row.get_style_context().add_class("search-hit")
+        GLib.timeout_add(2000, lambda: row.get_style_context().remove_class("search-hit") or False)
+        return True
+
+    def extend(self, key, text):
+        message = self.live.get(key)
+        if message is None:
+            return
+        message['text'] += text
+        row = self.find_row(message['id'])
+        if row is not None:
+            row.extend(text)
+
+    def close(self, key, suffix=""):
+        """Finish a live message and write its final text to the store"""
+        if suffix:
+            self.extend(key, suffix)
+        message = self.live.pop(key, None)
+        if message is not None:
+            self.store.finish(message['id'], message['text'])
+            row = self.find_row(message['id'])
+            if row is not None:
+                self.render(row)
+
+    def replace(self, key, text):
+        """Replace the body of a live message and finish it; False if the key is unknown"""
+        message = self.live.get(key)
+        if message is None:
+            return False
+        message['text'] = text
+        row = self.find_row(message['id'])
+        if row is not None:
+            row.set_body(text)
+        self.close(key)
+        return True
+
+    def remove(self, key):
+        """Delete a live message from the transcript and the store"""
+        message = self.live.pop(key, None)
+        if message is None:
+            return
+        row = self.find_row(message['id'])
+        if row is not None:
+            self.rows.remove(row)
+            row.destroy()
+        self.store.delete(message['id'])
+
+    def clear(self):
+        self.evict(len(self.rows), from_top=True)
+        self.live.clear()
+        self.store.clear()
+        self.latest_id = 0
+        self.stick = True
+
+    def remember_anchor(self):
+        """Remember the first visible row and its offset so paging does not move the view"""
+        value = self.get_vadjustment().get_value()
+        for row in self.rows:
+            allocation = row.get_allocation()
+            if allocation.y + allocation.height > value:
+                self.anchor = (row, allocation.y - value)
+                return
+
+    def on_edge_reached(self, window, position):
+        if not self.rows:
+            return
+        if position == Gtk.PositionType.TOP:
+            messages = self.store.page_before(self.rows[0].message_id, self.page)
+            if not messages:
+                return
+            self.remember_anchor()
+            self.stick = False
+            self.insert_rows(messages, 0)
+            if len(self.rows) > self.window:
+                self.evict(len(self.rows) - self.window, from_top=False)
+        elif position == Gtk.PositionType.BOTTOM and self.has_newer:
+            messages = self.store.page_after(self.rows[-1].message_id, self.page)
+            self.remember_anchor()
+            self.insert_rows(messages, len(self.rows))
+            if len(self.rows) > self.window:
+                self.evict(len(self.rows) - self.window, from_top=True)
+        else:
+            return
+        logging.debug(f"Transcript paged {position.value_nick}: {len(self.rows)} rows realized, "
+                      f"{self.evicted} evicted so far")
+
+    def on_scrolled(self, adjustment):
+        if self.adjusting:
+            return
+        # A user scroll ends any pending anchor and decides whether we follow new messages
+        self.anchor = None
+        bottom = adjustment.get_upper() - adjustment.get_page_size()
+        self.stick = adjustment.get_value() >= bottom - 2 and not self.has_newer
+
+    def on_list_allocated(self, widget, allocation):
+        adjustment = self.get_vadjustment()
+        if self.anchor is not None:
+            row, offset = self.anchor
+            if row.get_parent() is None:
+                self.anchor = None
+                return
+            value = row.get_allocation().y - offset
+        elif self.stick:
+            value = adjustment.get_upper() - adjustment.get_page_size()
+        else:
+            return
+        if abs(adjustment.get_value() - value) >= 1:
+            self.adjusting = True
+            adjustment.set_value(value)
+            self.adjusting = False
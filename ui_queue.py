@@ -0,0 +1,108 @@
+import os
+import time
+import logging
+import itertools
+import threading
+from collections import OrderedDict
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import GLib
+
+# Milliseconds of queued UI work run per frame before yielding to drawing
+FRAME_BUDGET_MS = float(os.getenv('NEXUS_UI_FRAME_BUDGET', '8'))
+
+
+class UIQueue:
+    """Batches updates from any thread onto the GTK main loop.
+
+    Updates are applied once per frame from a frame clock tick callback, in
+    the order they were posted, until the frame budget is spent. An update
+    posted with a key replaces a pending update with the same key, so only
+    the latest label text or menu refresh is applied. While the widget is not
+    mapped its frame clock does not tick and the queue drains from idle instead.
+    """
+
+    def __init__(self, widget, budget_ms=FRAME_BUDGET_MS):
+        self.widget = widget
+        self.budget = budget_ms / 1000
+        self.pending = OrderedDict()
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+        self.scheduled = False
+        self.closed = False
+        self.posted = 0
+        self.merged = 0
+        self.dropped = 0
+        self.applied = 0
+        self.frames = 0
+        self.over_budget = 0
+        widget.connect("destroy", lambda w: self.close())
+        widget.connect("unmap", self.on_unmap)
+
+    def post(self, callback, *args, key=None):
+        """Queue callback(*args) for the next frame; safe to call from any thread"""
+        with self.lock:
+            if self.closed:
+                self.dropped += 1
+                return
+            self.posted += 1
+            if key is None:
+                key = ("update", next(self.ids))
+            elif key in self.pending:
+                # Latest value wins but keeps its place in the queue
+                self.merged += 1
+            self.pending[key] = (callback, args)
+            if self.scheduled:
+                return
+            self.scheduled = True
+        GLib.idle_add(self.schedule)
+
+    def schedule(self):
+        if self.widget.get_mapped():
+            self.widget.add_tick_callback(lambda widget, clock: self.flush())
+        else:
+            GLib.idle_add(self.flush)
+        return False
+
+    def on_unmap(self, widget):
+        # A pending tick callback will not fire until the widget is shown again
+        with self.lock:
+            scheduled = self.scheduled
+        if scheduled:
+            GLib.idle_add(self.flush)
+
+    def flush(self):
+        """Apply queued updates until the frame budget runs out"""
+        started = time.perf_counter()
+        self.frames += 1
+        while True:
+            with self.lock:
+                if not self.pending:
+                    self.scheduled = False
+                    return GLib.SOURCE_REMOVE
+                if time.perf_counter() - started >= self.budget:
+                    self.over_budget += 1
+                    return GLib.SOURCE_CONTINUE
+                _, (callback, args) = self.pending.popitem(last=False)
+            try:
+                callback(*args)
+            except Exception as e:
+                logging.error(f"UI update {getattr(callback, '__name__', callback)} failed: {e}")
+            self.applied += 1
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.dropped += len(self.pending)
+            self.pending.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'posted': self.posted, 'applied': self.applied, 'merged': self.merged,
+                    'dropped': self.dropped, 'frames': self.frames, 'over_budget': self.over_budget,
+                    'pending': len(self.pending)}
+
+    def report(self):
+        stats = self.stats()
+        return (f"UI queue applied {stats['applied']}/{stats['posted']} in {stats['frames']} frames, "
+                f"merged {stats['merged']}, dropped {stats['dropped']}, over budget {stats['over_budget']}")